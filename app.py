@@ -3,12 +3,16 @@
 # Langue: FR
 
 import datetime as dt
+import functools
 from dateutil.relativedelta import relativedelta
 import pandas as pd
 import streamlit as st
 
 import data
 import logic
+import metrics
+import model_service
+import storage
 import styles
 import ui_components as ui
 import exporter
@@ -18,16 +22,34 @@ st.set_page_config(page_title="Bloowe – App Léa MALAO (POC)", page_icon="🩺
 # 1) Styles / Design System
 styles.inject()
 
-# 2) Initialisation des données (en session)
-if "db" not in st.session_state:
-    st.session_state.db = data.init_fake_data(seed=42, n_patients=12, n_days=60)
+# Diagnostics cachés : ?diag=1 dans l’URL affiche les métriques du process ; la collecte
+# elle-même ne s’active qu’au lancement (BLOOWE_METRICS=1), jamais depuis une session
+show_diag = st.query_params.get("diag") == "1"
+
+# 2) Modèle : chargement + warm-up une seule fois par process (pas de traçage TF sur la 1re requête)
+@st.cache_resource(show_spinner=False)
+def _model_ready() -> bool:
+    return data.warm_up_model()
+
+st.session_state.model_fallback = not _model_ready()
+
+# 3) Données : jeu de base construit une fois par process (mémoire, ou SQLite si BLOOWE_DB est défini),
+#    partagé en lecture ; chaque session travaille sur un overlay qui ne garde que ses propres écritures
+@st.cache_resource(show_spinner=False)
+def _base_db() -> dict:
+    base = data.open_db(storage.open_backend(), seed=42, n_patients=12, n_days=60)
 
     # 🔒 Mode "un seul patient" : fixe l'identité
-    db = st.session_state.db
-    db["patients"][0]["prenom"] = "Léa"
-    db["patients"][0]["nom"] = "MALAO"
+    lea = data.list_patients(base)[0]
+    lea["prenom"] = "Léa"
+    lea["nom"] = "MALAO"
+    data.save_patient(base, lea["id"])
+    return base
 
-# 3) Initialisation de l'état applicatif
+if "db" not in st.session_state:
+    st.session_state.db = data.fork_db(_base_db())
+
+# 4) Initialisation de l'état applicatif
 logic.init_state(st.session_state.db)
 
 db = st.session_state.db
@@ -61,16 +83,18 @@ with st.sidebar:
     if st.button("📤 Exporter les données (.xlsx)"):
         ok, msg = logic.can_export_patient(pid)
         if ok:
-            xls = exporter.export_patient_to_excel(db, pid)
-            st.session_state.last_export = xls
+            # export écrit en flux dans un fichier temporaire, réutilisé tant que rien n’a changé :
+            # seul son chemin reste en session
+            st.session_state.last_export = str(exporter.export_patient_cached(db, pid))
             st.success("Export prêt. Téléchargez ci-dessous (autorisation simulée).")
         else:
             st.warning(msg)
 
     if st.session_state.get("last_export"):
+        # callable : le fichier n’est lu qu’au clic, pas à chaque rerun (refait s’il a disparu)
         st.download_button(
             "⬇️ Télécharger l'export",
-            data=st.session_state["last_export"],
+            data=functools.partial(exporter.read_export, db, pid, st.session_state.last_export),
             file_name=f"export_{pid}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
@@ -100,8 +124,7 @@ tabs = st.tabs(["🏠 Accueil", "💬 Conversations", "📈 Graphs", "🧠 Conse
 
 # ---------------------- TAB 1: ACCUEIL --------------------------------------
 with tabs[0]:
-    s_df = data.get_series(db, pid)
-    s_df = s_df[(s_df["date"].dt.date >= st.session_state.date_from) & (s_df["date"].dt.date <= st.session_state.date_to)]
+    s_df = data.get_series_range(db, pid, st.session_state.date_from, st.session_state.date_to)
 
     last = s_df.iloc[-1]
     risk = float(last["risque"])
@@ -180,6 +203,14 @@ with tabs[0]:
 with tabs[1]:
     st.markdown("#### Mes conversations")
     convs = data.get_conversations(db, pid)
+    query = st.text_input("🔎 Rechercher dans mes messages", key="msg_query")
+    if query.strip():
+        found = data.search_messages(db, pid, query)
+        if found:
+            ui.message_list(found, current="patient")
+        else:
+            st.info("Aucun message ne correspond.")
+        st.markdown("---")
     if not convs:
         st.info("Aucune conversation.")
     else:
@@ -216,42 +247,38 @@ with tabs[1]:
 # ---------------------- TAB 3: GRAPHS ---------------------------------------
 with tabs[2]:
     st.markdown("#### Visualisations")
-    s_df = data.get_series(db, pid)
-    s_df = s_df[(s_df["date"].dt.date >= st.session_state.date_from) & (s_df["date"].dt.date <= st.session_state.date_to)]
-
-    # 1) Risque de crise
-    ui.chart_line(s_df, y="risque", title="Risque de crise (%)")
-
-    # 2) Taux sanguins (2 courbes)
-    ui.chart_multi_line(
-        s_df,
-        y_columns=[("hemoglobine_g_dl", "Hémoglobine (g/dL)"), ("hematocrite_l_l", "Hématocrite (L/L)")],
-        title="Taux sanguins"
-    )
-
-    # 3) Hydratation (histogramme)
-    ui.chart_bar(s_df, y="hydratation_verres", title="Hydratation (verres/jour)")
-
-    # 4) Activité physique
-    ui.chart_multi_line(
-        s_df,
-        y_columns=[("kcal_total", "Kcal quotidiennes"), ("kcal_sport", "Kcal sport")],
-        title="Activité"
+    s_df = data.get_series_range(
+        db, pid, st.session_state.date_from, st.session_state.date_to,
+        columns=["risque", "hemoglobine_g_dl", "hematocrite_l_l", "hydratation_verres", "kcal_total", "kcal_sport",
+                 "sommeil_minutes", "sommeil_qualite", "stress_niveau", "douleur_niveau"],
     )
 
-    # 5) Sommeil
-    ui.chart_line(s_df, y="sommeil_minutes", title="Sommeil – durée (min)")
-    ui.chart_bar(s_df, y="sommeil_qualite", title="Sommeil – qualité (1 à 5)")
-
-    # 6) Stress & douleur (histogrammes)
-    ui.chart_bar(s_df, y="stress_niveau", title="Stress (1 à 5)")
-    ui.chart_bar(s_df, y="douleur_niveau", title="Douleur (0 à 10)")
+    # Un seul jeu de données (réduit / agrégé) partagé par tous les graphes de l’onglet
+    ui.chart_panel(s_df, [
+        # 1) Risque de crise
+        ("line", "risque", "Risque de crise (%)"),
+        # 2) Taux sanguins (2 courbes)
+        ("line", [("hemoglobine_g_dl", "Hémoglobine (g/dL)"), ("hematocrite_l_l", "Hématocrite (L/L)")], "Taux sanguins"),
+        # 3) Hydratation (histogramme)
+        ("bar", "hydratation_verres", "Hydratation (verres/jour)"),
+        # 4) Activité physique
+        ("line", [("kcal_total", "Kcal quotidiennes"), ("kcal_sport", "Kcal sport")], "Activité"),
+        # 5) Sommeil
+        ("line", "sommeil_minutes", "Sommeil – durée (min)"),
+        ("bar", "sommeil_qualite", "Sommeil – qualité (1 à 5)"),
+        # 6) Stress & douleur (histogrammes)
+        ("bar", "stress_niveau", "Stress (1 à 5)"),
+        ("bar", "douleur_niveau", "Douleur (0 à 10)"),
+    ])
 
 # ---------------------- TAB 4: CONSEILS -------------------------------------
 with tabs[3]:
     st.markdown("#### Conseils")
-    sub = st.radio("Type de ressources", ["Personnalisés", "Globaux"], horizontal=True)
-    if sub == "Personnalisés":
+    query = st.text_input("🔎 Rechercher une ressource", key="res_query")
+    sub = st.radio("Type de ressources", ["Personnalisés", "Globaux"], horizontal=True, disabled=bool(query.strip()))
+    if query.strip():
+        resources = data.search_resources(db, query)
+    elif sub == "Personnalisés":
         resources = data.get_personalized_resources(db, pid, top_n=10)
     else:
         resources = data.get_resources_global(db)
@@ -286,6 +313,7 @@ with tabs[4]:
         st.subheader("Seuils d’alerte")
         thr = st.slider("Seuil de risque élevé (%)", min_value=20, max_value=95, value=int(patient["thresholds"]["risk_alert"]))
         patient["thresholds"]["risk_alert"] = thr
+        data.save_patient(db, pid)
         st.success("Préférences enregistrées (mémoire uniquement).")
 
     elif menu == "Partage des données":
@@ -316,4 +344,24 @@ with tabs[4]:
             else:
                 st.error("Veuillez taper exactement « supprimer ».")
 
-
+# ---------------------- DIAGNOSTICS (caché, ?diag=1) -------------------------
+if show_diag:
+    with st.sidebar:
+        st.markdown("---")
+        with st.expander("🔧 Diagnostics (métriques du process)"):
+            if not metrics.REGISTRY.enabled:
+                st.caption("Collecte désactivée : lancer l’app avec BLOOWE_METRICS=1.")
+            snap = metrics.REGISTRY.snapshot()
+            rows = [{"mesure": k, "n": h["count"], "p50": h.get("p50"), "p95": h.get("p95"), "max": h.get("max")}
+                    for k, h in snap["histograms"].items()]
+            if rows:
+                st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+            else:
+                st.caption("Aucune mesure pour l’instant.")
+            st.json(snap["counters"], expanded=False)
+            st.caption("Micro-batching (saisies concurrentes)")
+            st.json(model_service.dispatcher_stats(), expanded=False)
+            st.download_button("⬇️ Métriques (JSON)", data=metrics.REGISTRY.to_json(),
+                               file_name="metrics.json", mime="application/json")
+            if st.button("Réinitialiser les métriques"):
+                metrics.REGISTRY.reset()
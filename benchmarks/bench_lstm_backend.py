@@ -0,0 +1,78 @@
+# benchmarks/bench_lstm_backend.py
+# Backend LSTM NumPy vs Keras : parité des sorties + latence par taille de lot
+#
+#   python benchmarks/bench_lstm_backend.py [--atol 1e-5]
+# Code de sortie 1 si l’écart max dépasse --atol (utilisable comme contrôle de parité).
+
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import data  # noqa: E402
+from model_service import CrisisRiskModel, NumpyLSTM, load_model  # noqa: E402
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--atol", type=float, default=1e-5)
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+
+    # référence Keras : le .pkl d’origine (le dossier exporté ne contient que les poids NumPy)
+    model = load_model(str(data.PKL_PATH), lstm_backend="keras")
+    if model.lstm_backend != "keras" or isinstance(model.lstm, NumpyLSTM):
+        print(f"modèle Keras introuvable dans {data.PKL_PATH}")
+        return 1
+    t0 = time.perf_counter()
+    np_lstm = NumpyLSTM.from_keras(model.lstm)
+    print(f"extraction des poids : {(time.perf_counter()-t0)*1e3:.1f} ms")
+
+    L, n_feat = model.seq_length, model.lstm.input_shape[-1]
+    rng = np.random.default_rng(0)
+    worst = 0.0
+    print(f"{'lot':>6} | {'keras (ms)':>10} | {'numpy (ms)':>10} | {'x':>6} | {'écart max':>10}")
+    for n in (1, 8, 64, 1024):
+        X = rng.normal(size=(n, L, n_feat)).astype(np.float32)
+        ref = model.lstm.predict(X, verbose=0).reshape(-1)
+        got = np_lstm.predict(X).reshape(-1)
+        diff = float(np.abs(ref - got).max())
+        worst = max(worst, diff)
+        t_k = _best_of(lambda: model.lstm.predict(X, verbose=0), args.repeat)
+        t_n = _best_of(lambda: np_lstm.predict(X), args.repeat)
+        print(f"{n:>6} | {t_k*1e3:>10.2f} | {t_n*1e3:>10.2f} | {t_k/t_n:>5.1f}x | {diff:>10.2e}")
+
+    # parité bout en bout (preprocessor + XGB + combinaison) sur des features aléatoires
+    df = pd.DataFrame({"date": pd.date_range(end=pd.Timestamp.today().normalize(), periods=120, freq="D"),
+                       "Genotype": rng.choice(["SS", "SC", "AS"], size=120)})
+    for c in model.numeric_features:
+        df[c] = rng.normal(size=120)
+    numpy_model = CrisisRiskModel({"preprocessor": model.pre, "seq_length": L,
+                                   "feature_input_cols": model.feature_input_cols,
+                                   "numeric_features": model.numeric_features,
+                                   "categorical_features": model.categorical_features,
+                                   "lstm_model": model.lstm, "xgb_model": model.xgb},
+                                  alpha=model.alpha, lstm_backend="numpy")
+    diff = float((model.predict_proba_series(df.copy()) - numpy_model.predict_proba_series(df.copy())).abs().max())
+    worst = max(worst, diff)
+    print(f"predict_proba_series (120 j) : écart max {diff:.2e}")
+
+    ok = worst <= args.atol
+    print("parité OK" if ok else f"ÉCHEC parité : {worst:.2e} > {args.atol:.0e}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
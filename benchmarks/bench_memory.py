@@ -0,0 +1,56 @@
+# benchmarks/bench_memory.py
+# Mémoire des séries à l’échelle d’une cohorte : dtypes historiques (float64/int64 + génotype objet,
+# un DataFrame par patient) vs schéma compact (data.SERIES_SCHEMA) dans le SeriesStore
+#
+#   python benchmarks/bench_memory.py [--patients 5000] [--days 365]
+
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cohort  # noqa: E402
+import data  # noqa: E402
+
+# dtypes produits par _generate_series avant le schéma compact
+LEGACY_DTYPES = {
+    "risque": "float64", "hemoglobine_g_dl": "float64", "hematocrite_l_l": "float64",
+    "hydratation_verres": "int64", "kcal_total": "float64", "kcal_sport": "float64",
+    "sommeil_minutes": "float64", "sommeil_qualite": "int64", "stress_niveau": "int64",
+    "douleur_niveau": "int64", "Genotype": object,
+}
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patients", type=int, default=5_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--chunk-size", type=int, default=1_000)
+    args = ap.parse_args()
+
+    before = after = 0
+    store = data.SeriesStore()
+    t0 = time.perf_counter()
+    for chunk in cohort.iter_cohort(42, args.patients, args.days, args.chunk_size):
+        series = chunk["series"]
+        # avant : un DataFrame par patient aux dtypes historiques (mesure profonde, chaînes comprises)
+        legacy = series.drop(columns="patient_id").astype(LEGACY_DTYPES)
+        bounds = np.flatnonzero(np.r_[True, series["patient_id"].to_numpy()[1:] != series["patient_id"].to_numpy()[:-1]])
+        for a, b in zip(bounds, np.r_[bounds[1:], len(series)]):
+            before += int(legacy.iloc[a:b].memory_usage(deep=True, index=True).sum())
+        store.extend(series)
+    after = store.nbytes()
+    elapsed = time.perf_counter() - t0
+
+    rows = args.patients * args.days
+    print(f"{args.patients} patients × {args.days} jours ({rows} lignes), {elapsed:.1f} s")
+    print(f"  avant  (float64/int64, génotype objet) : {before / 2**20:9.1f} Mo  {before / args.patients / 1024:7.1f} Ko/patient  {before / rows:6.1f} o/ligne")
+    print(f"  après  (schéma compact, SeriesStore)    : {after / 2**20:9.1f} Mo  {after / args.patients / 1024:7.1f} Ko/patient  {after / rows:6.1f} o/ligne")
+    print(f"  gain : x{before / after:.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
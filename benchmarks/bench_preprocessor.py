@@ -0,0 +1,58 @@
+# benchmarks/bench_preprocessor.py
+# Preprocessor compilé (plan NumPy) vs ColumnTransformer sklearn : parité + latence
+#
+#   python benchmarks/bench_preprocessor.py
+# Code de sortie 1 si la sortie compilée diffère de sklearn (après arrondi float32).
+
+from __future__ import annotations
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data  # noqa: E402
+from model_service import load_model  # noqa: E402
+
+def _best_of(fn, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> int:
+    model = load_model(str(data.PKL_PATH))
+    compiled = model._pre_compiled
+    if compiled is None:
+        print("preprocessor non compilable : repli sklearn")
+        return 1
+
+    rng = np.random.default_rng(0)
+    worst = 0.0
+    print(f"{'lignes':>6} | {'sklearn (ms)':>12} | {'compilé (ms)':>12} | {'x':>6}")
+    for n in (1, 60, 365, 3650):
+        df = pd.DataFrame({"Genotype": rng.choice(["SS", "SC", "AS", "XX", np.nan], size=n)})
+        for c in model.numeric_features:
+            v = rng.normal(size=n) * 10
+            v[rng.random(n) < 0.1] = np.nan  # passe par l’imputation
+            df[c] = v
+        ref = model.pre.transform(df[model.feature_input_cols]).astype(np.float32)
+        worst = max(worst, float(np.abs(ref - compiled.transform(df)).max()))
+        t_sk = _best_of(lambda: model.pre.transform(df[model.feature_input_cols]))
+        t_c = _best_of(lambda: compiled.transform(df))
+        print(f"{n:>6} | {t_sk*1e3:>12.3f} | {t_c*1e3:>12.3f} | {t_sk/t_c:>5.1f}x")
+
+    rec = {c: 1.0 for c in model.numeric_features} | {"Genotype": "SC"}
+    t_sk = _best_of(lambda: model.pre.transform(pd.DataFrame([rec])[model.feature_input_cols]))
+    t_c = _best_of(lambda: compiled.transform_record(rec))
+    print(f"transform_record (1 ligne) : {t_sk*1e3:.3f} ms -> {t_c*1e3:.3f} ms")
+
+    print("parité OK" if worst == 0.0 else f"ÉCHEC parité : écart max {worst:.2e}")
+    return 0 if worst == 0.0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
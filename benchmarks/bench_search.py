@@ -0,0 +1,58 @@
+# benchmarks/bench_search.py
+# Recherche plein texte (search.SearchIndex) à l’échelle : indexation incrémentale de N messages
+# puis latence des requêtes, sur tout l’index et restreintes à un patient
+#
+#   python benchmarks/bench_search.py [--messages 1000000] [--queries 200]
+
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from faker import Faker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search import SearchIndex  # noqa: E402
+
+VOCAB = ["douleur", "crise", "hydratation", "fièvre", "sommeil", "fatigue", "hôpital", "résultats",
+         "hémoglobine", "rendez-vous", "traitement", "stress", "eau", "marche", "médecin", "urgence"]
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=1_000_000)
+    ap.add_argument("--patients", type=int, default=100_000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    Faker.seed(args.seed)
+    fake = Faker("fr_FR")
+    # phrases pré-tirées + un mot métier par message (comme cohort._Pools)
+    sentences = np.array([fake.sentence(nb_words=12) for _ in range(2_000)], dtype=object)
+    texts = sentences[rng.integers(0, len(sentences), args.messages)]
+    extra = np.array(VOCAB, dtype=object)[rng.integers(0, len(VOCAB), args.messages)]
+    owners = rng.integers(0, args.patients, args.messages)
+
+    index = SearchIndex()
+    t0 = time.perf_counter()
+    for i in range(args.messages):
+        index.add(f"{texts[i]} {extra[i]}", i, group=f"P{owners[i]}")
+    build = time.perf_counter() - t0
+    print(f"{args.messages} messages indexés en {build:.1f} s ({args.messages / build:,.0f}/s)")
+
+    queries = [" ".join(rng.choice(VOCAB, rng.integers(1, 4), replace=False)) for _ in range(args.queries)]
+    for label, group in (("index complet", lambda: None), ("un patient", lambda: f"P{rng.integers(args.patients)}")):
+        lat = np.empty(len(queries))
+        for i, q in enumerate(queries):
+            g = group()
+            t0 = time.perf_counter()
+            index.search(q, k=20, group=g)
+            lat[i] = time.perf_counter() - t0
+        print(f"  {label:<14} p50 {np.percentile(lat, 50) * 1e3:7.2f} ms  p95 {np.percentile(lat, 95) * 1e3:7.2f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
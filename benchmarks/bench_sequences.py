@@ -0,0 +1,59 @@
+# benchmarks/bench_sequences.py
+# Fenêtrage LSTM : boucle Python historique vs vue strided (sliding_window_view)
+#
+#   python benchmarks/bench_sequences.py [--repeat 20]
+
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_service import CrisisRiskModel  # noqa: E402
+
+N_FEAT = 14  # largeur de X_all après preprocessing (cf. artefact .pkl)
+
+def make_sequences_loop(X_all: np.ndarray, L: int) -> np.ndarray:
+    """Implémentation d’origine (référence)."""
+    X_seq = []
+    for i in range(L-1, len(X_all)):
+        X_seq.append(X_all[i-(L-1):i+1])
+    return np.array(X_seq) if X_seq else np.empty((0, L, X_all.shape[1]))
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--seq-length", type=int, default=14)
+    args = ap.parse_args()
+
+    model = CrisisRiskModel({"seq_length": args.seq_length})
+    L = model.seq_length
+    rng = np.random.default_rng(0)
+
+    print(f"{'jours':>6} | {'boucle (ms)':>11} | {'vue (ms)':>9} | {'vue+lot (ms)':>12} | {'x vue':>7} | {'x vue+lot':>9} | {'Mo boucle':>9}")
+    for n_days in (60, 365, 3650):
+        X_all = rng.normal(size=(n_days, N_FEAT))
+        ref = make_sequences_loop(X_all, L)
+        view = model._make_sequences(X_all)
+        assert view.shape == ref.shape and np.array_equal(view, ref)
+        assert not view.flags.writeable and np.shares_memory(view, X_all)
+
+        t_loop = _best_of(lambda: make_sequences_loop(X_all, L), args.repeat)
+        t_view = _best_of(lambda: model._make_sequences(X_all), args.repeat)
+        t_batch = _best_of(lambda: model._as_batch(model._make_sequences(X_all)), args.repeat)
+        print(f"{n_days:>6} | {t_loop*1e3:>11.3f} | {t_view*1e3:>9.3f} | {t_batch*1e3:>12.3f} | "
+              f"{t_loop/t_view:>6.0f}x | {t_loop/t_batch:>8.1f}x | {ref.nbytes/1e6:>9.2f}")
+
+if __name__ == "__main__":
+    main()
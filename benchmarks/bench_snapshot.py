@@ -0,0 +1,50 @@
+# benchmarks/bench_snapshot.py
+# Instantanés colonnaires (snapshot.py) à l’échelle d’une cohorte : écriture en flux depuis
+# cohort.iter_cohort, rechargement complet en db, lecture projetée (colonnes / patients)
+#
+#   python benchmarks/bench_snapshot.py [--patients 20000] [--days 365] [--dir /tmp/bloowe_snap]
+
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cohort  # noqa: E402
+import snapshot  # noqa: E402
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patients", type=int, default=20_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--chunk-size", type=int, default=1_000)
+    ap.add_argument("--dir", default="/tmp/bloowe_snap")
+    args = ap.parse_args()
+
+    rows = args.patients * args.days
+    print(f"{args.patients} patients × {args.days} jours ({rows} lignes)")
+    for fmt in snapshot.FORMATS:
+        directory = os.path.join(args.dir, fmt)
+        shutil.rmtree(directory, ignore_errors=True)
+        _, t_write = timed(lambda: snapshot.write_cohort(
+            cohort.iter_cohort(42, args.patients, args.days, args.chunk_size), directory, fmt))
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        db, t_load = timed(lambda: snapshot.load_snapshot(directory))
+        pids = list(db["series"])[:: max(1, args.patients // 10)]
+        del db
+        _, t_cols = timed(lambda: sum(len(f) for f in snapshot.read_series(
+            os.path.join(directory, f"series.{fmt}"), columns=["risque"])))
+        _, t_pids = timed(lambda: snapshot.load_snapshot(directory, pids=pids))
+        print(f"  {fmt:<8} écriture {t_write:6.1f} s  {size / 2**20:7.1f} Mo | chargement db {t_load:6.1f} s"
+              f" | colonne risque {t_cols:5.2f} s | {len(pids)} patients {t_pids:5.2f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# benchmarks/run.py
+# Suite de benchmarks reproductible : model_service + couche données + export
+#
+#   python benchmarks/run.py                              # tailles par défaut, résultats JSON
+#   python benchmarks/run.py --sizes 12x60,200x365 --out bench.json
+#   python benchmarks/run.py --save-baseline              # fige benchmarks/baseline.json
+#   python benchmarks/run.py --baseline benchmarks/baseline.json --tolerance 0.25
+#
+# Tout tourne hors ligne et sur CPU (CUDA masqué). Code de sortie 1 si une régression
+# (p50 au-delà de baseline × (1 + tolérance)) est détectée.
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import numpy as np  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import data  # noqa: E402
+import exporter  # noqa: E402
+from model_service import predict_patient_timeseries  # noqa: E402
+
+DEFAULT_SIZES = "12x60,50x365,200x365"
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+def peak_rss_mb() -> float | None:
+    """Pic de mémoire résidente du process (Mo), None si non mesurable sur la plateforme."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # octets (macOS) / Ko (Linux)
+
+def measure(fn, args_list: list[tuple]) -> dict:
+    """Appelle fn(*args) pour chaque entrée ; latences, débit et pic RSS."""
+    lat = np.empty(len(args_list))
+    t_start = time.perf_counter()
+    for i, args in enumerate(args_list):
+        t0 = time.perf_counter()
+        fn(*args)
+        lat[i] = time.perf_counter() - t0
+    wall = time.perf_counter() - t_start
+    return {
+        "calls": len(args_list),
+        "throughput_per_s": len(args_list) / wall if wall else None,
+        "p50_ms": float(np.percentile(lat, 50) * 1e3),
+        "p95_ms": float(np.percentile(lat, 95) * 1e3),
+        "max_ms": float(lat.max() * 1e3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def bench_size(n_patients: int, n_days: int, calls: int, seed: int) -> dict:
+    t0 = time.perf_counter()
+    db = data.init_fake_data(seed=seed, n_patients=n_patients, n_days=n_days)
+    results = {"init_fake_data": {"calls": 1, "p50_ms": (time.perf_counter() - t0) * 1e3,
+                                  "peak_rss_mb": peak_rss_mb()}}
+
+    rng = np.random.default_rng(seed)
+    pids = [p["id"] for p in data.list_patients(db)]
+    picks = [pids[i] for i in rng.integers(0, len(pids), size=calls)]
+    keras_path = str(data.KERAS_PATH) if data.KERAS_PATH.exists() else None
+
+    frames = {pid: db["series"][pid].rename(columns=data.FEATURE_RENAME) for pid in set(picks)}
+    results["predict_patient_timeseries"] = measure(
+        lambda pid: predict_patient_timeseries(frames[pid].copy(), str(data.PKL_PATH), keras_path),
+        [(pid,) for pid in picks])
+    results["add_daily_entry"] = measure(lambda pid: data.add_daily_entry(db, pid), [(pid,) for pid in picks])
+    # vues mémoïsées (cached_view) : calcul réel via __wrapped__, appels en cache mesurés à part
+    for name, call in (("get_conversations", lambda fn, pid: fn(db, pid)),
+                       ("get_personalized_resources", lambda fn, pid: fn(db, pid, top_n=10))):
+        fn = getattr(data, name)
+        results[name] = measure(lambda pid: call(fn.__wrapped__, pid), [(pid,) for pid in picks])
+        results[f"{name}_cached"] = measure(lambda pid: call(fn, pid), [(pid,) for pid in picks])
+    results["export_patient_to_excel"] = measure(
+        lambda pid: exporter.export_patient_to_excel(db, pid), [(pid,) for pid in picks[:max(1, calls // 5)]])
+    return results
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float = 0.5) -> list[str]:
+    """
+    Liste des régressions : p50 courant > p50 baseline × (1 + tolérance), en ignorant
+    les écarts absolus sous min_delta_ms (bruit des mesures sub-milliseconde).
+    """
+    regressions = []
+    for size, benches in current["results"].items():
+        for name, res in benches.items():
+            ref = baseline.get("results", {}).get(size, {}).get(name)
+            if not ref or not ref.get("p50_ms"):
+                continue
+            ratio = res["p50_ms"] / ref["p50_ms"]
+            if ratio > 1.0 + tolerance and res["p50_ms"] - ref["p50_ms"] > min_delta_ms:
+                regressions.append(f"{size} {name}: p50 {res['p50_ms']:.2f} ms vs {ref['p50_ms']:.2f} ms (x{ratio:.2f})")
+    return regressions
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="liste patients×jours, ex. 12x60,200x365")
+    ap.add_argument("--calls", type=int, default=50, help="appels mesurés par fonction et par taille")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", default=None, help="JSON de référence à comparer")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument("--min-delta-ms", type=float, default=0.5)
+    ap.add_argument("--save-baseline", action="store_true", help=f"écrit aussi {BASELINE_PATH}")
+    args = ap.parse_args()
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "numpy": np.__version__, "seed": args.seed, "calls": args.calls,
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": {},
+    }
+    # chargement + warm-up du modèle hors mesures (sinon imputé à la 1re taille)
+    t0 = time.perf_counter()
+    data.warm_up_model()
+    report["meta"]["model_load_ms"] = (time.perf_counter() - t0) * 1e3
+    print(f"modèle chargé en {report['meta']['model_load_ms']:.0f} ms")
+
+    for size in args.sizes.split(","):
+        n_patients, n_days = (int(x) for x in size.lower().split("x"))
+        print(f"== {n_patients} patients × {n_days} jours")
+        res = report["results"][size] = bench_size(n_patients, n_days, args.calls, args.seed)
+        for name, r in res.items():
+            tput = f"{r['throughput_per_s']:9.1f}/s" if r.get("throughput_per_s") else " " * 11
+            p95 = f"{r['p95_ms']:9.2f}" if "p95_ms" in r else " " * 9
+            print(f"  {name:<34} p50 {r['p50_ms']:9.2f} ms  p95 {p95} ms  {tput}  RSS {r['peak_rss_mb'] or 0:7.1f} Mo")
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"résultats -> {args.out}")
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline -> {BASELINE_PATH}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        for r in regressions:
+            print(f"RÉGRESSION {r}")
+        if regressions:
+            return 1
+        print("aucune régression")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
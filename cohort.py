@@ -0,0 +1,225 @@
+# cohort.py
+# Générateur vectorisé de grandes cohortes factices (tests de charge), produit par lots
+#
+#   python cohort.py --patients 100000 --days 365 --db .data/cohort.db
+#   python cohort.py --patients 100000 --days 365 --snapshot .data/cohort_snap   # Parquet (snapshot.py)
+#
+# Même schéma que data.init_fake_data, mais les tirages sont faits par lot de patients en
+# tableaux NumPy (marche aléatoire bornée en 2-D, noms tirés dans des pools pré-échantillonnés,
+# messages en masse). Déterministe pour (seed, chunk_size) ; mémoire bornée à un lot.
+
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+import unicodedata
+import warnings
+from collections.abc import Iterator
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+import data
+
+PROFILES = np.array(["Drépanocytose SS", "Drépanocytose SC", "Porteur AS"], dtype=object)
+SPECIALITES = ["Hématologue", "Généraliste", "Interniste"]
+
+def _slug(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode()
+    return "".join(ch for ch in s.lower() if ch.isalnum())
+
+class _Pools:
+    """Prénoms, noms, villes et phrases pré-tirés une fois avec Faker (le coût ne dépend plus de la taille)."""
+
+    def __init__(self, fake: Faker, size: int = 512):
+        self.first_f = np.array([fake.first_name_female() for _ in range(size)], dtype=object)
+        self.first_m = np.array([fake.first_name_male() for _ in range(size)], dtype=object)
+        self.last = np.array([fake.last_name().upper() for _ in range(size)], dtype=object)
+        self.cities = np.array([fake.city() for _ in range(size // 2)], dtype=object)
+        self.sentences = np.array([fake.sentence(nb_words=12) for _ in range(size)], dtype=object)
+
+def _doctors(rng: np.random.Generator, pools: _Pools, n: int) -> list[dict]:
+    female = rng.random(n) < 0.5
+    first = np.where(female, pools.first_f[rng.integers(0, len(pools.first_f), n)],
+                     pools.first_m[rng.integers(0, len(pools.first_m), n)])
+    last = pools.last[rng.integers(0, len(pools.last), n)]
+    spec = rng.integers(0, len(SPECIALITES), n)
+    return [{"id": f"D{i+1:03d}", "prenom": first[i], "nom": last[i], "specialite": SPECIALITES[spec[i]],
+             "email": f"{_slug(first[i])}.{_slug(last[i])}.d{i+1}@example.org"} for i in range(n)]
+
+def _patients(rng: np.random.Generator, pools: _Pools, start: int, n: int, n_doctors: int) -> list[dict]:
+    female = rng.random(n) < 0.5
+    first = np.where(female, pools.first_f[rng.integers(0, len(pools.first_f), n)],
+                     pools.first_m[rng.integers(0, len(pools.first_m), n)])
+    last = pools.last[rng.integers(0, len(pools.last), n)]
+    city = pools.cities[rng.integers(0, len(pools.cities), n)]
+    profile = PROFILES[rng.integers(0, len(PROFILES), n)]
+    age = rng.integers(16, 66, n)
+    height = rng.integers(150, 196, n)
+    weight = rng.integers(50, 96, n)
+    # partages : 1 ou 2 médecins distincts, sommeil / stress au hasard
+    n_shares = rng.integers(1, 3, n)
+    doc_a = rng.integers(0, n_doctors, n)
+    doc_b = (doc_a + rng.integers(1, max(n_doctors, 2), n)) % n_doctors
+    flags = rng.random((n, 2, 2)) < 0.5
+
+    patients = []
+    for i in range(n):
+        pid = f"P{start+i}"
+        sharing = []
+        for j, d in enumerate((doc_a[i], doc_b[i])[:n_shares[i]]):
+            sharing.append({"doctor_id": f"D{d+1:03d}", "data_access": {
+                "risque": True, "sanguins": True, "hydratation": True, "activite": True,
+                "sommeil": bool(flags[i, j, 0]), "stress": bool(flags[i, j, 1]), "douleur": True}})
+        patients.append({
+            "id": pid, "prenom": first[i], "nom": last[i],
+            "email": f"{_slug(first[i])}.{_slug(last[i])}.{start+i}@example.org",
+            "sexe": "F" if female[i] else "M", "age": int(age[i]), "taille_cm": int(height[i]),
+            "poids_kg": int(weight[i]), "ville": city[i], "profile": profile[i],
+            "thresholds": {"risk_alert": 70},
+            "notification_prefs": {"risk_alerts": True, "daily_reminder": True, "tips": True},
+            "active": True, "sharing": sharing,
+        })
+    return patients
+
+def _series(rng: np.random.Generator, pids: np.ndarray, genos: np.ndarray, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    """Séries de tout le lot en format long (patient, date) ; les mesures sont tirées en 2-D (jours × patients)."""
+    n, d = len(pids), len(dates)
+    # Marche aléatoire bornée : une ligne contiguë par jour, tous les patients à la fois
+    risk = np.empty((d, n))
+    risk[0] = rng.uniform(20, 60, n)
+    steps = rng.normal(0, 4, (d - 1, n))
+    for t in range(1, d):
+        np.clip(risk[t-1] + steps[t-1], 0, 100, out=risk[t])
+
+    def long(a: np.ndarray) -> np.ndarray:
+        return a.T.reshape(-1)  # (jours, patients) -> patient par patient
+
+    shape = (d, n)
+    return data.compact_series(pd.DataFrame({
+        "patient_id": np.repeat(pids, d),
+        "date": np.tile(dates.to_numpy(), n),
+        "risque": long(risk).round(1),
+        "hemoglobine_g_dl": long(np.clip(rng.normal(9.5, 1.1, shape), 6.5, 12.5).round(1)),
+        "hematocrite_l_l": long(np.clip(rng.normal(0.32, 0.05, shape), 0.2, 0.45).round(3)),
+        "hydratation_verres": long(np.clip(rng.poisson(6, shape), 0, 12)),
+        "kcal_total": long(np.clip(rng.normal(2100, 300, shape), 1200, 4000).round(0)),
+        "kcal_sport": long(np.clip(rng.normal(180, 120, shape), 0, 800).round(0)),
+        "sommeil_minutes": long(np.clip(rng.normal(420, 60, shape), 240, 600).round(0)),
+        "sommeil_qualite": long(rng.integers(1, 6, shape)),
+        "stress_niveau": long(rng.integers(1, 6, shape)),
+        "douleur_niveau": long(rng.integers(0, 11, shape)),
+        "Genotype": np.repeat(genos, d),
+    }))
+
+def _messages(rng: np.random.Generator, pools: _Pools, patients: list[dict]) -> pd.DataFrame:
+    """2 à 6 messages alternés médecin/patient par patient, avec le 1er médecin partagé."""
+    n = len(patients)
+    pids = np.array([p["id"] for p in patients], dtype=object)
+    dids = np.array([p["sharing"][0]["doctor_id"] for p in patients], dtype=object)
+    nb = rng.integers(2, 7, n)
+    owner = np.repeat(np.arange(n), nb)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(nb) - nb, nb)
+    from_doctor = k % 2 == 0
+    base_time = pd.Timestamp.today().normalize() - pd.Timedelta(days=10)
+    ts = (base_time.to_datetime64() + k.astype("timedelta64[D]")
+          + rng.integers(0, 11*60 + 1, len(owner)).astype("timedelta64[m]"))
+    return pd.DataFrame({
+        "id": [f"M{pids[o]}{kk+1:03d}" for o, kk in zip(owner, k)],
+        "patient_id": pids[owner],
+        "doctor_id": dids[owner],
+        "sender": np.where(from_doctor, "doctor", "patient").astype(object),
+        "text": pools.sentences[rng.integers(0, len(pools.sentences), len(owner))],
+        "timestamp": ts.astype("datetime64[ns]"),
+        "read_by_patient": ~from_doctor,
+        "read_by_doctor": from_doctor,
+    })
+
+def _score(series: pd.DataFrame) -> None:
+    """Risque du lot recalculé par le modèle (un seul appel groupé) ; conserve la marche simulée si indisponible."""
+    try:
+        keras_path = str(data.KERAS_PATH) if data.KERAS_PATH.exists() else None
+        frames = {pid: g.drop(columns="patient_id").rename(columns=data.FEATURE_RENAME)
+                  for pid, g in series.groupby("patient_id", sort=False)}
+        preds = data.predict_cohort(frames, str(data.PKL_PATH), keras_path, alpha=0.6)
+        # retour au dtype compact du schéma (le lot est déjà passé par compact_series)
+        series["risque"] = (np.concatenate([np.asarray(preds[pid], dtype=float) for pid in frames]).round(1)
+                            .astype(data.SERIES_SCHEMA["risque"]))
+    except Exception as exc:
+        warnings.warn(f"scoring par le modèle indisponible, risque simulé conservé : {exc!r}", RuntimeWarning)
+
+def iter_cohort(seed: int = 42, n_patients: int = 100_000, n_days: int = 365, chunk_size: int = 1_000,
+                n_doctors: int | None = None, score: bool = False) -> Iterator[dict]:
+    """
+    Cohorte produite par lots de chunk_size patients : dicts {patients, series, messages}
+    (+ doctors / resources dans le 1er lot). Séries et messages en DataFrames longs triés
+    par patient, directement consommables par SQLiteBackend.bulk_load ou data.SeriesStore.
+    """
+    n_doctors = n_doctors or max(3, n_patients // 250)
+    Faker.seed(seed)
+    random.seed(seed)
+    fake = Faker("fr_FR")
+    pools = _Pools(fake)
+    root = np.random.SeedSequence(seed)
+    n_chunks = -(-n_patients // chunk_size)
+    rngs = [np.random.default_rng(s) for s in root.spawn(n_chunks + 1)]
+
+    doctors = _doctors(rngs[0], pools, n_doctors)
+    resources = data._generate_resources(fake)
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=n_days, freq="D")
+
+    for c in range(n_chunks):
+        rng = rngs[c + 1]
+        start = 1000 + c * chunk_size
+        n = min(chunk_size, n_patients - c * chunk_size)
+        patients = _patients(rng, pools, start, n, n_doctors)
+        pids = np.array([p["id"] for p in patients], dtype=object)
+        genos = np.array([data._infer_genotype(p["profile"]) for p in patients], dtype=object)
+        series = _series(rng, pids, genos, dates)
+        if score:
+            _score(series)
+        chunk = {"patients": patients, "series": series, "messages": _messages(rng, pools, patients)}
+        if c == 0:
+            chunk.update(doctors=doctors, resources=resources)
+        yield chunk
+
+def build_db(seed: int = 42, n_patients: int = 10_000, n_days: int = 365, chunk_size: int = 1_000, **kw) -> dict:
+    """db en mémoire (mêmes stores que data.init_fake_data), ingéré lot par lot."""
+    patients, doctors, resources = [], [], []
+    series, messages = data.SeriesStore(), []
+    for chunk in iter_cohort(seed, n_patients, n_days, chunk_size, **kw):
+        patients += chunk["patients"]
+        doctors += chunk.get("doctors", [])
+        resources += chunk.get("resources", [])
+        series.extend(chunk["series"])
+        messages += chunk["messages"].to_dict("records")
+    return data._build_db({"patients": patients, "doctors": doctors, "resources": resources,
+                           "series": series, "messages": messages})
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patients", type=int, default=100_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--chunk-size", type=int, default=1_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--score", action="store_true", help="recalcule le risque avec le modèle (lent)")
+    out = ap.add_mutually_exclusive_group(required=True)
+    out.add_argument("--db", help="fichier SQLite cible (écrasé)")
+    out.add_argument("--snapshot", help="répertoire d’instantané Parquet / Arrow (snapshot.py)")
+    ap.add_argument("--format", choices=("parquet", "arrow"), default="parquet", help="format de --snapshot")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    chunks = iter_cohort(args.seed, args.patients, args.days, args.chunk_size, score=args.score)
+    if args.db:
+        from storage import SQLiteBackend
+        n_rows, target = SQLiteBackend(args.db).bulk_load(chunks), args.db
+    else:
+        import snapshot
+        n_rows, target = snapshot.write_cohort(chunks, args.snapshot, args.format), args.snapshot
+    print(f"{args.patients} patients, {n_rows} lignes de séries -> {target} en {time.perf_counter() - t0:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,31 @@
 # Génération et accès aux données factices (patients, séries, messages, ressources)
 
 from __future__ import annotations
+import bisect
+import copy
+import functools
+import heapq
+import itertools
 import random
 import io
+import threading
+from collections import ChainMap, OrderedDict
+from collections.abc import Iterable, MutableMapping
+from pathlib import Path
 import numpy as np
 import pandas as pd
 from faker import Faker
 
+import metrics
+from search import SearchIndex
+from storage import MemoryBackend, new_id
+from model_service import load_model, predict_patient_timeseries, predict_patient_latest, predict_cohort
+
+# Artefacts du modèle hybride (cf. model_service.load_model)
+MODELS_DIR = Path(__file__).resolve().parent / "models"
+PKL_PATH = MODELS_DIR / "hybrid_crisis_predictor.pkl"
+KERAS_PATH = MODELS_DIR / "hybrid_crisis_predictor.keras"  # seulement si le LSTM n’est pas dans le .pkl
+
 # Facultatif : si ton modèle attend d’autres noms de colonnes, mappe-les ici.
 FEATURE_RENAME = {
     # "hemoglobine_g_dl": "hemoglobin",
@@ -21,6 +40,9 @@ FEATURE_RENAME = {
     # "douleur_niveau": "pain",
 }
 
+# Horloge des versions (Versions, ResourceIndex) : valeurs uniques et croissantes dans le process
+_CLOCK = itertools.count(1)
+
 def _infer_genotype(profile: str) -> str:
     """Extrait le génotype à partir de la chaîne profil."""
     s = (profile or "").upper()
@@ -30,6 +52,686 @@ def _infer_genotype(profile: str) -> str:
         return "AS"
     return "SS"  # par défaut
 
+def warm_up_model() -> bool:
+    """Charge le modèle et exécute une inférence factice ; False si le modèle est indisponible."""
+    try:
+        keras_path = str(KERAS_PATH) if KERAS_PATH.exists() else None
+        load_model(str(PKL_PATH), keras_path, alpha=0.6, warmup=True)
+        return True
+    except Exception:
+        return False
+
+_MEMORY = MemoryBackend()
+
+# ----------------------- Schéma compact des séries --------------------------
+
+GENOTYPES = ["SS", "SC", "AS"]
+
+# dtype de stockage par colonne : scores bornés sur 8 bits, minutes / kcal sur 16 bits,
+# mesures biologiques et risque en float32, génotype catégoriel (codes int8)
+SERIES_SCHEMA = {
+    "risque": np.float32,
+    "hemoglobine_g_dl": np.float32,
+    "hematocrite_l_l": np.float32,
+    "hydratation_verres": np.int8,
+    "kcal_total": np.int16,
+    "kcal_sport": np.int16,
+    "sommeil_minutes": np.int16,
+    "sommeil_qualite": np.int8,
+    "stress_niveau": np.int8,
+    "douleur_niveau": np.int8,
+    "Genotype": pd.CategoricalDtype(GENOTYPES),
+}
+
+def _compact(values, dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pd.Categorical(values, dtype=dtype) if not isinstance(getattr(values, "dtype", None), pd.CategoricalDtype) \
+            else values.astype(dtype)
+    values = np.asarray(values)
+    if np.dtype(dtype).kind in "iu" and values.dtype.kind == "f":
+        if np.isnan(values).any():
+            return values.astype(np.float32)  # valeurs manquantes : pas d’entier possible
+        values = np.rint(values)
+    return values.astype(dtype, copy=False)
+
+def compact_series(df: pd.DataFrame) -> pd.DataFrame:
+    """Applique SERIES_SCHEMA aux colonnes présentes (les autres sont laissées telles quelles)."""
+    return df.assign(**{c: _compact(df[c].array, dt) for c, dt in SERIES_SCHEMA.items() if c in df})
+
+def _column_arrays(df: pd.DataFrame) -> dict:
+    """Colonnes d’un DataFrame (large ou long) au dtype du schéma, prêtes pour _SeriesTable."""
+    cols = {}
+    for c in df.columns:
+        if c == "patient_id":
+            continue
+        cols[c] = _compact(df[c].array, SERIES_SCHEMA[c]) if c in SERIES_SCHEMA else df[c].to_numpy()
+    cols["date"] = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]")
+    return cols
+
+# ----------------------- Stockage colonnaire des séries ---------------------
+
+class _SeriesTable:
+    """
+    Colonnes NumPy d’un patient, triées par date ; seules les n premières lignes sont valides.
+    Les colonnes catégorielles sont stockées en codes int8 (-1 = manquant) + liste de catégories.
+    """
+
+    def __init__(self, columns: dict[str, np.ndarray | pd.Categorical]):
+        n = len(columns["date"])
+        cap = max(16, n)
+        self.n = n
+        self.cols: dict[str, np.ndarray] = {}
+        self.cats: dict[str, list] = {}
+        for c, values in columns.items():
+            if isinstance(values, pd.Categorical):
+                self.cats[c] = list(values.categories)
+                values = values.codes.astype(np.int8)
+            arr = np.empty(cap, dtype=values.dtype)
+            arr[:n] = values
+            self.cols[c] = arr
+
+    def copy(self) -> _SeriesTable:
+        t = object.__new__(_SeriesTable)
+        t.n = self.n
+        t.cols = {c: arr.copy() for c, arr in self.cols.items()}
+        t.cats = {c: list(cats) for c, cats in self.cats.items()}
+        return t
+
+    def nbytes(self) -> int:
+        return sum(arr.nbytes for arr in self.cols.values())
+
+    def _code(self, c: str, value) -> int:
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return -1
+        cats = self.cats[c]
+        if value not in cats:
+            cats.append(value)  # nouvelle modalité : ajoutée en fin (codes existants inchangés)
+        return cats.index(value)
+
+    def decode(self, c: str, codes: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(codes, categories=self.cats[c])
+
+    @property
+    def capacity(self) -> int:
+        return len(self.cols["date"])
+
+    def _grow(self) -> None:
+        cap = 2 * self.capacity  # doublement : append amorti O(1)
+        for c, arr in self.cols.items():
+            new = np.empty(cap, dtype=arr.dtype)
+            new[:self.n] = arr[:self.n]
+            self.cols[c] = new
+
+    def _add_column(self, c: str, value) -> None:
+        dtype = SERIES_SCHEMA.get(c, np.asarray(value).dtype if not isinstance(value, str) else object)
+        if isinstance(dtype, pd.CategoricalDtype):
+            self.cats[c] = list(dtype.categories)
+            dtype = np.int8
+        arr = np.empty(self.capacity, dtype=dtype)
+        arr[:] = -1 if c in self.cats else _missing_value(arr.dtype)
+        self.cols[c] = arr
+
+    def _write(self, i: int, row: dict) -> None:
+        for c, v in row.items():
+            if c not in self.cols:
+                self._add_column(c, v)
+        for c, arr in self.cols.items():
+            if c == "date":
+                arr[i] = pd.Timestamp(row["date"]).to_datetime64()
+            elif c in self.cats:
+                arr[i] = self._code(c, row.get(c))
+            elif c in row:
+                arr[i] = row[c]
+            else:
+                arr[i] = _missing_value(arr.dtype)
+
+    def upsert(self, row: dict) -> None:
+        """Ajoute (ou écrase, à date égale) une ligne ; O(1) amorti pour un jour ≥ au dernier."""
+        date = np.datetime64(pd.Timestamp(row["date"]).to_datetime64(), "ns")
+        dates = self.cols["date"]
+        n = self.n
+        if n and date == dates[n-1]:
+            self._write(n-1, row)
+            return
+        if n == 0 or date > dates[n-1]:
+            i = n
+        else:
+            i = int(np.searchsorted(dates[:n], date))
+            if dates[i] == date:
+                self._write(i, row)
+                return
+        if n == self.capacity:
+            self._grow()
+        if i < n:
+            # insertion rétro-datée (rare) : décalage O(n)
+            for arr in self.cols.values():
+                arr[i+1:n+1] = arr[i:n]
+        self._write(i, row)
+        self.n += 1
+
+    def column(self, c: str, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Vue en lecture seule d’une colonne (lignes valides uniquement)."""
+        v = self.cols[c][start:self.n if stop is None else min(stop, self.n)]
+        v.flags.writeable = False
+        return v
+
+    def frame(self, start: int = 0, stop: int | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        cols = ["date"] + [c for c in (columns or self.cols) if c != "date"]
+        return pd.DataFrame({c: self.decode(c, self.column(c, start, stop)) if c in self.cats else self.column(c, start, stop)
+                             for c in cols}, copy=False)
+
+def _missing_value(dtype: np.dtype):
+    if dtype.kind == "f":
+        return np.nan
+    if dtype.kind == "M":
+        return np.datetime64("NaT")
+    if dtype.kind == "O":
+        return None
+    return 0
+
+class SeriesStore(MutableMapping):
+    """
+    Séries quotidiennes de tous les patients, stockées en colonnes NumPy typées (une table
+    par patient, capacité doublée au besoin). store[pid] renvoie un DataFrame construit à la
+    demande sur des vues en lecture seule ; les écritures passent par upsert().
+    fork() partage les tables et ne copie celle d’un patient qu’à sa première écriture.
+    """
+
+    def __init__(self, frames: dict[str, pd.DataFrame] | pd.DataFrame | Iterable[pd.DataFrame] | None = None):
+        self._tables: dict[str, _SeriesTable] | ChainMap = {}
+        self._cow = False
+        if isinstance(frames, dict):
+            for pid, df in frames.items():
+                self[pid] = df
+        elif isinstance(frames, pd.DataFrame):
+            self.extend(frames)
+        else:
+            for frame in frames or ():  # flux de lots au format long
+                self.extend(frame)
+
+    def extend(self, frame: pd.DataFrame) -> None:
+        """
+        Ingestion en masse d’un format long (colonne patient_id, trié par patient puis date) :
+        découpage par patient sur les bornes de groupes, sans groupby ni DataFrame intermédiaire.
+        """
+        pids = frame["patient_id"].to_numpy()
+        if not len(pids):
+            return
+        cols = _column_arrays(frame)
+        starts = np.flatnonzero(np.r_[True, pids[1:] != pids[:-1]])
+        stops = np.r_[starts[1:], len(pids)]
+        for a, b in zip(starts, stops):
+            self._tables[pids[a]] = _SeriesTable({c: v[a:b] for c, v in cols.items()})
+
+    def fork(self) -> SeriesStore:
+        """Vue de session : lectures sur la base (non modifiée), écritures dans un overlay."""
+        s = object.__new__(SeriesStore)
+        s._tables = ChainMap({}, self._tables)
+        s._cow = True
+        return s
+
+    def __getitem__(self, pid: str) -> pd.DataFrame:
+        return self._tables[pid].frame()
+
+    def __setitem__(self, pid: str, df: pd.DataFrame) -> None:
+        self._tables[pid] = _SeriesTable(_column_arrays(df.sort_values("date")))
+
+    def __delitem__(self, pid: str) -> None:
+        del self._tables[pid]
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def table(self, pid: str) -> _SeriesTable:
+        return self._tables[pid]
+
+    def upsert(self, pid: str, row: dict) -> None:
+        if self._cow and pid not in self._tables.maps[0]:
+            self._tables[pid] = self._tables[pid].copy()  # copie à la première écriture
+        self._tables[pid].upsert(row)
+
+    def n_rows(self, pid: str) -> int:
+        return self._tables[pid].n
+
+    def nbytes(self) -> int:
+        """Octets des tableaux de colonnes (capacité réservée comprise)."""
+        return sum(t.nbytes() for t in self._tables.values())
+
+    def frame(self, pid: str, start: int = 0, stop: int | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        return self._tables[pid].frame(start, stop, columns)
+
+    def position(self, pid: str, date, side: str = "left") -> int:
+        """Indice d’insertion de `date` dans la colonne date (recherche dichotomique)."""
+        t = self._tables[pid]
+        return int(np.searchsorted(t.cols["date"][:t.n], np.datetime64(pd.Timestamp(date).to_datetime64(), "ns"), side=side))
+
+    def last_row(self, pid: str, before: pd.Timestamp | None = None) -> dict | None:
+        """Dernière ligne (ou dernière strictement antérieure à `before`) sous forme de dict, en O(1)/O(log n)."""
+        t = self._tables[pid]
+        i = t.n - 1 if before is None else self.position(pid, before) - 1
+        if i < 0:
+            return None
+        return {c: (pd.Timestamp(arr[i]) if c == "date" else t.cats[c][arr[i]] if c in t.cats and arr[i] >= 0
+                    else None if c in t.cats else arr[i]) for c, arr in t.cols.items()}
+
+# ----------------------- Stockage indexé des messages -----------------------
+
+class MessageStore:
+    """
+    Messages indexés par conversation (patient_id, doctor_id), chaque fil trié par horodatage.
+    Dernier message et non-lus côté patient sont tenus à jour à
+    l’insertion : aperçus de conversations et lecture d’un fil sans parcourir tous les messages.
+    fork() partage les fils et ne copie un fil (et ses messages) qu’à sa première modification.
+    Le texte des messages alimente un index plein texte (search), filtrable par patient.
+    """
+
+    def __init__(self, messages: list[dict] | pd.DataFrame | None = None):
+        if isinstance(messages, pd.DataFrame):
+            messages = messages.to_dict("records")
+        self._threads: dict[tuple[str, str], list[dict]] | ChainMap = {}
+        self._doctors: dict[str, dict[str, None]] | ChainMap = {}  # pid -> médecins (ordre du 1er message)
+        self._unread: dict[tuple[str, str], list[dict]] | ChainMap = {}
+        self._n = 0
+        self._cow = False
+        self.search = SearchIndex()
+        for m in messages or []:
+            self.append(m)
+
+    def fork(self) -> MessageStore:
+        """Vue de session : lectures sur la base (non modifiée), écritures dans un overlay."""
+        s = object.__new__(MessageStore)
+        s._threads = ChainMap({}, self._threads)
+        s._doctors = ChainMap({}, self._doctors)
+        s._unread = ChainMap({}, self._unread)
+        s._n = self._n
+        s._cow = True
+        s.search = self.search.fork()
+        return s
+
+    def _own(self, key: tuple[str, str]) -> list[dict] | None:
+        """Fil modifiable : en overlay, copie du fil et de ses messages à la première écriture."""
+        thread = self._threads.get(key)
+        if thread is not None and self._cow and key not in self._threads.maps[0]:
+            thread = self._threads[key] = [dict(m) for m in thread]
+            self._unread[key] = [m for m in thread if m["sender"] == "doctor" and not m.get("read_by_patient", False)]
+        return thread
+
+    def append(self, msg: dict) -> None:
+        pid, did = msg["patient_id"], msg["doctor_id"]
+        key = (pid, did)
+        thread = self._own(key)
+        if thread is None:
+            thread = self._threads[key] = []
+            self._unread[key] = []
+            self._doctors[pid] = {**self._doctors.get(pid, {}), did: None}
+        if not thread or msg["timestamp"] >= thread[-1]["timestamp"]:
+            thread.append(msg)
+        else:
+            # message rétro-daté : insertion triée (après les horodatages égaux)
+            thread.insert(bisect.bisect_right(thread, msg["timestamp"], key=lambda m: m["timestamp"]), msg)
+        if msg["sender"] == "doctor" and not msg.get("read_by_patient", False):
+            self._unread[key].append(msg)
+        self._n += 1
+        self.search.add(msg["text"], msg, group=pid)
+
+    def __iter__(self):
+        for thread in self._threads.values():
+            yield from thread
+
+    def __len__(self) -> int:
+        return self._n
+
+    def next_id(self, pid: str) -> str:
+        return new_id(f"M{pid}-")
+
+    def thread(self, pid: str, did: str) -> list[dict]:
+        return self._threads.get((pid, did), [])
+
+    def doctor_ids(self, pid: str) -> list[str]:
+        return list(self._doctors.get(pid, ()))
+
+    def last(self, pid: str, did: str) -> dict | None:
+        thread = self._threads.get((pid, did))
+        return thread[-1] if thread else None
+
+    def unread_count(self, pid: str, did: str) -> int:
+        return len(self._unread.get((pid, did), ()))
+
+    def for_patient(self, pid: str) -> list[dict]:
+        """Tous les messages du patient, fusionnés par horodatage."""
+        threads = [self._threads[(pid, did)] for did in self._doctors.get(pid, ())]
+        return list(heapq.merge(*threads, key=lambda m: m["timestamp"]))
+
+    def mark_read_by_patient(self, pid: str, did: str) -> None:
+        if not self._unread.get((pid, did)):
+            return
+        self._own((pid, did))
+        unread = self._unread[(pid, did)]
+        for m in unread:
+            m["read_by_patient"] = True
+        unread.clear()
+
+# ----------------------- Registre des entités -------------------------------
+
+SHARE_KEYS = ["risque", "sanguins", "hydratation", "activite", "sommeil", "stress", "douleur"]
+# colonnes de série couvertes par chaque autorisation de partage
+SHARE_COLUMNS = {
+    "risque": ["risque"], "sanguins": ["hemoglobine_g_dl", "hematocrite_l_l"],
+    "hydratation": ["hydratation_verres"], "activite": ["kcal_total", "kcal_sport"],
+    "sommeil": ["sommeil_minutes", "sommeil_qualite"], "stress": ["stress_niveau"], "douleur": ["douleur_niveau"],
+}
+
+def shared_columns(data_access: dict) -> list[str]:
+    """Colonnes de série visibles pour un partage (ordre de SHARE_KEYS)."""
+    return [c for k in SHARE_KEYS if data_access.get(k) for c in SHARE_COLUMNS[k]]
+
+class EntityRegistry:
+    """
+    Index des patients et médecins : dictionnaires par id, par e-mail (insensible à la casse)
+    et index inverse des partages médecin -> {patient: data_access}. Les modifications d’un
+    profil se font sur le dict renvoyé par patient(pid) ; seules les clés d’index (e-mail,
+    partages) passent par les méthodes du registre. fork() crée un overlay de session où un
+    patient n’est copié qu’au premier accès en écriture.
+    """
+
+    def __init__(self, patients: list[dict], doctors: list[dict]):
+        self.patients: dict[str, dict] | ChainMap = {}
+        self.doctors: dict[str, dict] | ChainMap = {}
+        self._patient_emails: dict[str, str] | ChainMap = {}
+        self._doctor_emails: dict[str, str] | ChainMap = {}
+        self._shared: dict[str, dict[str, dict]] | ChainMap = {}  # did -> {pid: data_access}
+        self._cow = False
+        for d in doctors:
+            self.add_doctor(d)
+        for p in patients:
+            self.add_patient(p)
+
+    def fork(self) -> EntityRegistry:
+        """Vue de session : lectures sur la base (non modifiée), écritures dans un overlay."""
+        r = object.__new__(EntityRegistry)
+        r.patients = ChainMap({}, self.patients)
+        r.doctors = ChainMap({}, self.doctors)
+        r._patient_emails = ChainMap({}, self._patient_emails)
+        r._doctor_emails = ChainMap({}, self._doctor_emails)
+        r._shared = ChainMap({}, self._shared)
+        r._cow = True
+        return r
+
+    def _shared_for(self, did: str) -> dict[str, dict]:
+        """Entrée modifiable de l’index inverse (copiée dans l’overlay si elle vient de la base)."""
+        if self._cow and did not in self._shared.maps[0]:
+            self._shared[did] = dict(self._shared.get(did, {}))
+        return self._shared.setdefault(did, {})
+
+    def add_doctor(self, doctor: dict) -> None:
+        self.doctors[doctor["id"]] = doctor
+        self._doctor_emails[doctor["email"].lower()] = doctor["id"]
+        self._shared_for(doctor["id"])
+
+    def add_patient(self, patient: dict) -> None:
+        self.patients[patient["id"]] = patient
+        self._patient_emails[patient["email"].lower()] = patient["id"]
+        for share in patient.get("sharing", []):
+            self._shared_for(share["doctor_id"])[patient["id"]] = share["data_access"]
+
+    def patient(self, pid: str) -> dict:
+        """Profil modifiable en place (en overlay : copie profonde au premier accès)."""
+        p = self.patients[pid]
+        if self._cow and pid not in self.patients.maps[0]:
+            p = copy.deepcopy(p)
+            self.add_patient(p)
+        return p
+
+    def base_patient(self, pid: str) -> dict | None:
+        """Profil tel qu’il est dans la base (None hors overlay ou pour un patient créé en session)."""
+        return self.patients.parents.get(pid) if self._cow else None
+
+    def patient_by_email(self, email: str) -> dict | None:
+        # index jamais purgé : l’entrée n’est valide que si l’e-mail courant correspond encore
+        p = self.patients.get(self._patient_emails.get(email.lower()))
+        return p if p is not None and p["email"].lower() == email.lower() else None
+
+    def doctor_by_email(self, email: str) -> dict | None:
+        d = self.doctors.get(self._doctor_emails.get(email.lower()))
+        return d if d is not None and d["email"].lower() == email.lower() else None
+
+    def set_patient_email(self, pid: str, email: str) -> None:
+        p = self.patient(pid)
+        p["email"] = email
+        self._patient_emails[email.lower()] = pid
+
+    def share(self, pid: str, did: str, data_access: dict | None = None) -> dict:
+        """Crée (ou renvoie) le partage patient -> médecin et l’indexe côté médecin."""
+        p = self.patient(pid)
+        for s in p["sharing"]:
+            if s["doctor_id"] == did:
+                return s
+        share = {"doctor_id": did, "data_access": data_access or {k: True for k in SHARE_KEYS}}
+        p["sharing"].append(share)
+        self._shared_for(did)[pid] = share["data_access"]
+        return share
+
+    def set_access(self, pid: str, did: str, key: str, value: bool) -> None:
+        self.patient(pid)
+        # data_access est le même dict côté patient et dans l’index inverse
+        self._shared[did][pid][key] = bool(value)
+
+    def shared_with(self, did: str, key: str | None = None) -> dict[str, dict]:
+        """Patients ayant partagé avec le médecin (option : seulement ceux dont le flag `key` est actif)."""
+        shared = self._shared.get(did, {})
+        if key is None:
+            return dict(shared)
+        return {pid: acc for pid, acc in shared.items() if acc.get(key)}
+
+# ----------------------- Index des ressources -------------------------------
+
+class ResourceIndex:
+    """
+    Catalogue de ressources indexé pour les recommandations. Les ressources sont regroupées par
+    ensemble de tags (personalized_keys), chaque groupe trié par date décroissante : pour un jeu
+    de flags patient, le recouvrement est constant par groupe, d’où un top-N exact par fusion
+    (heap merge) des groupes de même recouvrement, du plus fort au plus faible. Titre et contenu
+    des ressources publiées sont indexés en plein texte (search). fork() donne une vue de
+    session : listes de la base copiées au premier ajout, index plein texte en niveau enfant.
+    """
+
+    def __init__(self, resources: list[dict]):
+        # clé de tri : date décroissante, puis ordre d’insertion (comme le tri stable d’origine)
+        self._by_date = sorted(((-pd.Timestamp(r["date"]).value, i, r) for i, r in enumerate(resources)),
+                               key=lambda e: e[:2])
+        self._n = len(self._by_date)
+        self._groups: dict[frozenset, list[tuple]] = {}
+        for entry in self._by_date:
+            self._groups.setdefault(frozenset(entry[2]["personalized_keys"]), []).append(entry)
+        self.search = SearchIndex()
+        self._indexed: set[str] = set()
+        self._cow = False
+        for r in resources:
+            self.index_text(r)
+        self.version = next(_CLOCK)  # catalogue commun aux sessions : version portée par l’index
+
+    def fork(self) -> ResourceIndex:
+        """Vue de session : lectures sur la base (non modifiée), ajouts dans des copies."""
+        r = object.__new__(ResourceIndex)
+        r._by_date, r._n, r._groups, r._indexed = self._by_date, self._n, self._groups, self._indexed
+        r.search = self.search.fork()
+        r._cow = True
+        r.version = self.version
+        return r
+
+    def index_text(self, resource: dict) -> None:
+        """Indexe une ressource publiée (une seule fois par id)."""
+        if resource["visibility"] == "Publié" and resource["id"] not in self._indexed:
+            self._indexed.add(resource["id"])
+            self.search.add(f"{resource['title']}\n{resource['content']}", resource)
+
+    def add(self, resource: dict) -> None:
+        """Ajoute (ou remplace, même id : brouillon publié) une ressource, sans réindexer le reste."""
+        if self._cow:
+            # copies superficielles (tuples partagés) ; le texte déjà indexé reste dans la base
+            self._by_date = list(self._by_date)
+            self._groups = {tags: list(entries) for tags, entries in self._groups.items()}
+            self._indexed = set(self._indexed)
+            self._cow = False
+        old = next((e for e in self._by_date if e[2]["id"] == resource["id"]), None)
+        if old is not None:
+            self._by_date.remove(old)
+            self._groups[frozenset(old[2]["personalized_keys"])].remove(old)
+            entry = (-pd.Timestamp(resource["date"]).value, old[1], resource)
+        else:
+            entry = (-pd.Timestamp(resource["date"]).value, self._n, resource)
+            self._n += 1
+        bisect.insort(self._groups.setdefault(frozenset(resource["personalized_keys"]), []), entry, key=lambda e: e[:2])
+        bisect.insort(self._by_date, entry, key=lambda e: e[:2])
+        self.index_text(resource)
+        self.version = next(_CLOCK)
+
+    def top(self, keys: set[str], n: int) -> list[dict]:
+        """n ressources de plus fort recouvrement avec `keys`, les plus récentes d’abord à égalité."""
+        levels: dict[int, list[list[tuple]]] = {}
+        for tags, entries in self._groups.items():
+            levels.setdefault(len(tags & keys), []).append(entries)
+        out = []
+        for overlap in sorted(levels, reverse=True):
+            for _, _, r in heapq.merge(*levels[overlap], key=lambda e: e[:2]):
+                out.append(r)
+                if len(out) == n:
+                    return out
+        return out
+
+    def latest(self, visibility: str | None = None) -> list[dict]:
+        """Catalogue trié par date décroissante (option : filtré sur la visibilité)."""
+        return [r for _, _, r in self._by_date if visibility is None or r["visibility"] == visibility]
+
+# ----------------------- Versions & cache des vues --------------------------
+
+ENTITIES = ("series", "messages", "profile", "sharing")
+
+class Versions:
+    """
+    Compteurs de version par (patient, entité), tirés d’une horloge commune au process : une
+    version n’identifie qu’un seul état, quels que soient le db ou la session. Tant qu’une entité
+    n’a pas changé, sa version est celle de la base (partagée par toutes les sessions forkées).
+    """
+
+    def __init__(self):
+        self._base = next(_CLOCK)
+        self.scope = next(_CLOCK)  # identité du db / de la session (caches hors db, ex. predict_latest)
+        self._v: dict[tuple[str, str], int] | ChainMap = {}
+        self._snapshots: dict[str, tuple[dict, list]] | ChainMap = {}
+
+    def fork(self) -> Versions:
+        v = object.__new__(Versions)
+        v._base = self._base
+        v.scope = next(_CLOCK)
+        v._v = ChainMap({}, self._v)
+        v._snapshots = ChainMap({}, self._snapshots)
+        return v
+
+    def get(self, pid: str, entity: str) -> int:
+        return self._v.get((pid, entity), self._base)
+
+    def of(self, pid: str, entities: tuple[str, ...] = ENTITIES) -> tuple[int, ...]:
+        return tuple(self._v.get((pid, e), self._base) for e in entities)
+
+    def bump(self, pid: str, entity: str) -> int:
+        v = self._v[(pid, entity)] = next(_CLOCK)
+        return v
+
+    def sync_profile(self, pid: str, patient: dict, baseline: dict | None = None) -> bool:
+        """
+        Profil modifié en place : ne change de version que ce qui diffère du dernier état connu
+        (à défaut, de `baseline`, le profil de la base). Renvoie True si quelque chose a changé.
+        """
+        profile = {k: v for k, v in patient.items() if k != "sharing"}
+        sharing = patient.get("sharing", [])
+        prev = self._snapshots.get(pid)
+        if prev is None and baseline is not None:
+            prev = ({k: v for k, v in baseline.items() if k != "sharing"}, baseline.get("sharing", []))
+        if prev is not None and prev[0] == profile and prev[1] == sharing:
+            return False
+        if prev is None or prev[0] != profile:
+            self.bump(pid, "profile")
+        if prev is None or prev[1] != sharing:
+            self.bump(pid, "sharing")
+        self._snapshots[pid] = (copy.deepcopy(profile), copy.deepcopy(sharing))
+        return True
+
+class ViewCache:
+    """
+    Cache LRU borné des exports et vues dérivées, clé = (fonction, pid, versions, arguments).
+    Une écriture change la version de l’entité touchée : les entrées qui en dépendent ne sont
+    plus jamais demandées et sortent par éviction (on_evict, ex. suppression d’un fichier).
+    """
+
+    def __init__(self, maxsize: int = 1024, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self._entries: OrderedDict[tuple, object] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, key: tuple, compute, valid=None):
+        with self._lock:
+            if key in self._entries and (valid is None or valid(self._entries[key])):
+                self._entries.move_to_end(key)
+                metrics.inc("view_cache.hit")
+                return self._entries[key]
+        metrics.inc("view_cache.miss")
+        value = compute()  # hors verrou : les calculs concurrents ne se bloquent pas
+        evicted = []
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False)[1])
+        if self.on_evict:
+            for old in evicted:
+                self.on_evict(old)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            evicted = list(self._entries.values())
+            self._entries.clear()
+        if self.on_evict:
+            for old in evicted:
+                self.on_evict(old)
+
+VIEW_CACHE = ViewCache()
+
+def _hashable(v):
+    return tuple(v) if isinstance(v, list) else v
+
+def cached_view(*entities: str, resources: bool = False):
+    """
+    Mémoïse une vue f(db, pid, ...) dans VIEW_CACHE selon les versions des entités dont elle
+    dépend (et du catalogue de ressources si resources=True). Le cache est partagé entre
+    appels (et sessions) : chaque appelant reçoit sa propre copie (cf. _copy_view).
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(db: dict, pid: str, *args, **kwargs):
+            versions = db["versions"].of(pid, entities)
+            if resources:
+                versions += (db["resource_index"].version,)
+            key = (fn.__qualname__, pid, versions, tuple(map(_hashable, args)),
+                   tuple(sorted((k, _hashable(v)) for k, v in kwargs.items())))
+            return _copy_view(VIEW_CACHE.get_or_compute(key, lambda: fn(db, pid, *args, **kwargs)))
+        return wrapper
+    return deco
+
+def _copy_view(value):
+    """Copie rendue par cached_view : liste et dicts de premier niveau recréés."""
+    if isinstance(value, list):
+        return [dict(v) if isinstance(v, dict) else v for v in value]
+    return value
+
 # ----------------------- Génération -----------------------------------------
 
 def init_fake_data(seed: int = 42, n_patients: int = 12, n_days: int = 60) -> dict:
@@ -52,19 +754,7 @@ def init_fake_data(seed: int = 42, n_patients: int = 12, n_days: int = 60) -> di
         })
 
     # Ressources / Conseils
-    res_types = ["Hydratation", "Activité", "Sommeil", "Douleur", "Prévention"]
-    resources = []
-    for i in range(12):
-        rtype = random.choice(res_types)
-        resources.append({
-            "id": f"R{i+1:03d}",
-            "title": f"{rtype} – {fake.sentence(nb_words=4).rstrip('.')}",
-            "type": rtype,
-            "content": "\n\n".join(fake.paragraphs(nb=3)),
-            "personalized_keys": random.sample(["risk_high", "hydration_low", "sleep_low", "pain_high", "stress_high"], k=2),
-            "date": pd.Timestamp.today() - pd.Timedelta(days=random.randint(0, 120)),
-            "visibility": "Publié",
-        })
+    resources = _generate_resources(fake)
 
     patients, series, messages = [], {}, []
     start_id = 1000
@@ -102,7 +792,7 @@ def init_fake_data(seed: int = 42, n_patients: int = 12, n_days: int = 60) -> di
 
         # Séries 30–60 jours
         geno = _infer_genotype(patient["profile"])
-        series[pid] = _generate_series(n_days=n_days, seed=seed+i, genotype_code=geno)
+        series[pid] = _generate_series(n_days=n_days, seed=seed+i, genotype_code=geno, score=False)
 
         # Messages (≥40 au total)
         nb = random.randint(2, 6)
@@ -121,9 +811,75 @@ def init_fake_data(seed: int = 42, n_patients: int = 12, n_days: int = 60) -> di
                 "read_by_doctor": sender == "doctor",
             })
 
-    return {"patients": patients, "series": series, "messages": messages, "doctors": doctors, "resources": resources}
+    _score_series(series)
+    return _build_db({"patients": patients, "series": series, "messages": messages, "doctors": doctors, "resources": resources})
+
+def _generate_resources(fake: Faker, n: int = 12) -> list[dict]:
+    res_types = ["Hydratation", "Activité", "Sommeil", "Douleur", "Prévention"]
+    resources = []
+    for i in range(n):
+        rtype = random.choice(res_types)
+        resources.append({
+            "id": f"R{i+1:03d}",
+            "title": f"{rtype} – {fake.sentence(nb_words=4).rstrip('.')}",
+            "type": rtype,
+            "content": "\n\n".join(fake.paragraphs(nb=3)),
+            "personalized_keys": random.sample(["risk_high", "hydration_low", "sleep_low", "pain_high", "stress_high"], k=2),
+            "date": pd.Timestamp.today() - pd.Timedelta(days=random.randint(0, 120)),
+            "visibility": "Publié",
+        })
+    return resources
+
+def _build_db(raw: dict, backend=None) -> dict:
+    """Assemble le db (stores indexés) à partir de listes / DataFrames bruts."""
+    return {
+        "resources": raw["resources"], "resource_index": ResourceIndex(raw["resources"]),
+        "series": raw["series"] if isinstance(raw["series"], SeriesStore) else SeriesStore(raw["series"]),
+        "messages": MessageStore(raw["messages"]),
+        "registry": EntityRegistry(raw["patients"], raw["doctors"]),
+        "versions": Versions(),
+        "backend": backend or _MEMORY,
+    }
+
+def open_db(backend=None, seed: int = 42, n_patients: int = 12, n_days: int = 60) -> dict:
+    """
+    Jeu de données de session adossé à un backend (storage.py). Backend vide (ou mémoire) :
+    génération factice puis sauvegarde en masse ; sinon lecture depuis le disque.
+    """
+    backend = backend or _MEMORY
+    if backend.is_empty():
+        db = init_fake_data(seed=seed, n_patients=n_patients, n_days=n_days)
+        backend.save_all(db)
+        db["backend"] = backend
+        return db
+    return _build_db(backend.load_all(), backend)
+
+def fork_db(base: dict) -> dict:
+    """
+    db de session au-dessus d’un jeu de base partagé (construit une fois par process) :
+    la base n’est jamais modifiée, chaque store n’enregistre que les écritures de la session.
+    """
+    return {
+        "resources": base["resources"], "resource_index": base["resource_index"].fork(),
+        "series": base["series"].fork(), "messages": base["messages"].fork(),
+        "registry": base["registry"].fork(), "versions": base["versions"].fork(),
+        "backend": base["backend"],
+    }
+
+def _score_series(series: dict[str, pd.DataFrame]) -> None:
+    """Remplace (en place) 'risque' par la prédiction du modèle, toute la cohorte en un seul lot."""
+    try:
+        keras_path = str(KERAS_PATH) if KERAS_PATH.exists() else None
+        frames = {pid: df.rename(columns=FEATURE_RENAME, errors="ignore") for pid, df in series.items()}
+        preds = predict_cohort(frames, str(PKL_PATH), keras_path, alpha=0.6)
+        for pid, pred in preds.items():
+            series[pid]["risque"] = pred.astype(float).round(1)
+    except Exception:
+        # Fallback silencieux : on conserve le risque simulé si le modèle ne charge pas
+        pass
 
-def _generate_series(n_days: int = 60, seed: int = 0, genotype_code: str = "SS") -> pd.DataFrame:
+def _generate_series(n_days: int = 60, seed: int = 0, genotype_code: str = "SS", score: bool = True) -> pd.DataFrame:
+    """Série quotidienne factice ; score=False laisse le risque simulé (scoring groupé via _score_series)."""
     rng = np.random.RandomState(seed)
     end = pd.Timestamp.today().normalize()
     dates = pd.date_range(end=end, periods=n_days, freq="D")
@@ -151,6 +907,9 @@ def _generate_series(n_days: int = 60, seed: int = 0, genotype_code: str = "SS")
     # --- Colonnes nécessaires au modèle
     df["Genotype"] = genotype_code
 
+    if not score:
+        return compact_series(df)
+
     # Si nécessaire, renommer pour coller aux noms attendus par le .pkl
     df_for_model = df.rename(columns=FEATURE_RENAME, errors="ignore").copy()
 
@@ -165,24 +924,49 @@ def _generate_series(n_days: int = 60, seed: int = 0, genotype_code: str = "SS")
         # (tu peux aussi logguer/afficher un avertissement côté UI)
         pass
 
-    return df
+    return compact_series(df)
 
 # ----------------------- Accès / utilitaires --------------------------------
 
 def list_patients(db: dict) -> list[dict]:
-    return db["patients"]
+    return list(db["registry"].patients.values())
 
 def get_patient(db: dict, pid: str) -> dict:
-    return next(p for p in db["patients"] if p["id"] == pid)
+    return db["registry"].patient(pid)
+
+def save_patient(db: dict, pid: str) -> bool:
+    """
+    Persiste le profil (préférences, seuils, partages) après modification en place, seulement
+    s’il diffère du dernier état connu de la session : un rerun Streamlit sans changement
+    n’écrit rien (une session ouverte sur une base plus ancienne ne réécrit donc pas son profil
+    périmé à l’affichage). Toute modification écrit en revanche le document complet : la
+    dernière session qui enregistre l’emporte, y compris sur les champs qu’elle n’a pas
+    touchés, et la base en mémoire reste celle du démarrage jusqu’au prochain lancement.
+    """
+    patient = get_patient(db, pid)
+    if not db["versions"].sync_profile(pid, patient, baseline=db["registry"].base_patient(pid)):
+        return False
+    db["backend"].save_patient(patient)
+    return True
 
 def get_series(db: dict, pid: str) -> pd.DataFrame:
     return db["series"][pid].copy()
 
+def get_series_range(db: dict, pid: str, date_from, date_to, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Lignes dont la date (jour) est dans [date_from, date_to], bornes incluses.
+    Bornes localisées par recherche dichotomique ; renvoie des vues en lecture seule
+    (pas de copie de l’historique), limitées aux colonnes demandées (+ date).
+    """
+    store = db["series"]
+    start = store.position(pid, pd.Timestamp(date_from).normalize())
+    stop = store.position(pid, pd.Timestamp(date_to).normalize() + pd.Timedelta(days=1))
+    return store.frame(pid, start, stop, columns)
+
 def add_daily_entry(db: dict, pid: str, **kwargs) -> dict:
     """Ajoute/écrase la ligne du jour avec les valeurs fournies (ou aléatoires)."""
-    df = db["series"][pid].copy()
+    store = db["series"]
     today = pd.Timestamp.today().normalize()
-    df = df[df["date"] != today]
 
     # Entrées (fallback aléatoire raisonnable)
     pain = int(kwargs.get("douleur_niveau", np.random.randint(0, 10)))
@@ -190,8 +974,8 @@ def add_daily_entry(db: dict, pid: str, **kwargs) -> dict:
     sleep = int(kwargs.get("sommeil_minutes", np.random.randint(300, 540)))
     water = int(kwargs.get("hydratation_verres", np.random.randint(2, 12)))
 
-    # Petit modèle synthétique de risque (POC)
-    prev = float(df.iloc[-1]["risque"])
+    # Petit modèle synthétique de risque (POC) à partir du dernier jour avant aujourd’hui
+    prev = float(store.last_row(pid, before=today)["risque"])
     risk = prev + (pain - 5) * 2 + (stress - 3) * 2 + (-1 if water > 6 else 1) * 2 + (-1 if sleep >= 420 else 2)
     risk = float(np.clip(risk + np.random.randn() * 2, 0, 100))
 
@@ -208,84 +992,102 @@ def add_daily_entry(db: dict, pid: str, **kwargs) -> dict:
         "stress_niveau": stress,
         "douleur_niveau": pain,
     }
-    new_df = pd.concat([df, pd.DataFrame([row])], ignore_index=True).sort_values("date")
-    # --- Tentative de recalcul via modèle pour la dernière ligne
+    geno = _infer_genotype(get_patient(db, pid)["profile"])
+    # --- Recalcul via modèle de la seule ligne du jour (scoring incrémental)
     try:
-        geno = _infer_genotype(get_patient(db, pid)["profile"])
-        tmp = new_df.copy()
-        tmp["Genotype"] = geno
-        tmp_for_model = tmp.rename(columns=FEATURE_RENAME, errors="ignore")
+        row_for_model = {FEATURE_RENAME.get(k, k): v for k, v in {**row, "Genotype": geno}.items()}
+        # l’historique n’est lu que pour amorcer le cache du modèle (1er appel pour ce patient)
+        history = lambda: store.frame(pid, stop=store.position(pid, today)).assign(Genotype=geno).rename(columns=FEATURE_RENAME, errors="ignore")
         keras_path = str(KERAS_PATH) if KERAS_PATH.exists() else None
-        pred = predict_patient_timeseries(tmp_for_model, str(PKL_PATH), keras_path, alpha=0.6)
-        # Remplace le risque de la dernière ligne par la prédiction du modèle
-        new_df.loc[new_df.index[-1], "risque"] = float(pred.iloc[-1])
-        row["risque"] = float(pred.iloc[-1])
+        risk_model = predict_patient_latest(pid, row_for_model, history, str(PKL_PATH), keras_path, alpha=0.6,
+                                            scope=db["versions"].scope)
+        # Remplace le risque heuristique par la prédiction du modèle
+        row["risque"] = float(risk_model)
     except Exception:
-        # si le modèle échoue, on garde la valeur heuristique déjà dans 'row' / 'new_df'
+        # si le modèle échoue, on garde la valeur heuristique déjà dans 'row'
         pass
-    db["series"][pid] = new_df
+    # upsert en place de la ligne du jour : O(1) amorti, sans recopier l’historique ;
+    # les valeurs sont converties aux dtypes compacts de SERIES_SCHEMA à l’écriture
+    store.upsert(pid, {**row, "Genotype": geno})
+    db["versions"].bump(pid, "series")
+    db["backend"].upsert_series_row(pid, {**row, "Genotype": geno})
     return row
 
 # --- Messages / conversations ---
 
 def get_doctor(db: dict, did: str) -> dict | None:
-    for d in db["doctors"]:
-        if d["id"] == did:
-            return d
-    return None
+    return db["registry"].doctors.get(did)
 
+@cached_view("messages")
 def get_conversations(db: dict, pid: str) -> list[dict]:
-    convs = {}
-    for m in db["messages"]:
-        if m["patient_id"] != pid:
-            continue
-        did = m["doctor_id"]
-        convs.setdefault(did, {"doctor": get_doctor(db, did), "last": None, "unread": 0})
-        if (convs[did]["last"] is None) or (m["timestamp"] > convs[did]["last"]["timestamp"]):
-            convs[did]["last"] = m
-        if m["sender"] == "doctor" and not m.get("read_by_patient", False):
-            convs[did]["unread"] += 1
-    return list(convs.values())
+    store = db["messages"]
+    return [{"doctor": get_doctor(db, did), "last": store.last(pid, did), "unread": store.unread_count(pid, did)}
+            for did in store.doctor_ids(pid)]
 
 def get_messages(db: dict, pid: str, did: str) -> list[dict]:
-    return sorted([m for m in db["messages"] if m["patient_id"] == pid and m["doctor_id"] == did],
-                  key=lambda x: x["timestamp"])
+    return list(db["messages"].thread(pid, did))
 
 def add_message(db: dict, pid: str, did: str, sender: str, text: str) -> dict:
-    mid = f"M{pid}{len([m for m in db['messages'] if m['patient_id']==pid])+1:03d}"
+    store = db["messages"]
     msg = {
-        "id": mid, "patient_id": pid, "doctor_id": did, "sender": sender, "text": text,
+        "id": store.next_id(pid), "patient_id": pid, "doctor_id": did, "sender": sender, "text": text,
         "timestamp": pd.Timestamp.now(), "read_by_patient": sender == "patient", "read_by_doctor": sender == "doctor"
     }
-    db["messages"].append(msg)
+    store.append(msg)
+    db["versions"].bump(pid, "messages")
+    db["backend"].add_message(msg)
     return msg
 
 def mark_conversation_read_by_patient(db: dict, pid: str, did: str) -> None:
-    for m in db["messages"]:
-        if m["patient_id"] == pid and m["doctor_id"] == did:
-            m["read_by_patient"] = True
+    if not db["messages"].unread_count(pid, did):
+        return  # rien à marquer : pas d’écriture ni de nouvelle version (reruns Streamlit)
+    db["messages"].mark_read_by_patient(pid, did)
+    db["versions"].bump(pid, "messages")
+    db["backend"].mark_read_by_patient(pid, did)
+
+def search_messages(db: dict, pid: str, query: str, k: int = 20) -> list[dict]:
+    """Messages du patient (tous médecins) les plus pertinents pour la requête."""
+    return [m for m, _ in db["messages"].search.search(query, k, group=pid)]
 
 # --- Ressources / Conseils ---
 
+def patient_flags(db: dict, pid: str) -> set[str]:
+    """Tags de recommandation déduits de la dernière ligne de la série (sans copie de l’historique)."""
+    last = db["series"].last_row(pid)
+    keys = set()
+    if last["risque"] >= 70: keys.add("risk_high")
+    if last["hydratation_verres"] <= 4: keys.add("hydration_low")
+    if last["sommeil_minutes"] < 360: keys.add("sleep_low")
+    if last["douleur_niveau"] >= 6: keys.add("pain_high")
+    if last["stress_niveau"] >= 4: keys.add("stress_high")
+    return keys
+
+@cached_view("series", resources=True)
 def get_personalized_resources(db: dict, pid: str, top_n: int = 3) -> list[dict]:
-    df = get_series(db, pid)
-    last = df.iloc[-1]
-    keys = []
-    if last["risque"] >= 70: keys.append("risk_high")
-    if last["hydratation_verres"] <= 4: keys.append("hydration_low")
-    if last["sommeil_minutes"] < 360: keys.append("sleep_low")
-    if last["douleur_niveau"] >= 6: keys.append("pain_high")
-    if last["stress_niveau"] >= 4: keys.append("stress_high")
-
-    scored = []
-    for r in db["resources"]:
-        overlap = len(set(keys).intersection(r["personalized_keys"]))
-        scored.append((overlap, r["date"], r))
-    scored.sort(key=lambda t: (t[0], t[1]), reverse=True)
-    return [r for _, __, r in scored[:top_n]]
+    return db["resource_index"].top(patient_flags(db, pid), top_n)
 
 def get_resources_global(db: dict) -> list[dict]:
-    return sorted([r for r in db["resources"] if r["visibility"] == "Publié"], key=lambda r: r["date"], reverse=True)
+    return db["resource_index"].latest(visibility="Publié")
+
+def search_resources(db: dict, query: str, k: int = 10) -> list[dict]:
+    """Ressources publiées les plus pertinentes pour la requête (BM25, sans accents)."""
+    return [r for r, _ in db["resource_index"].search.search(query, k)]
+
+def publish_resource(db: dict, resource: dict) -> dict:
+    """
+    Publie une ressource (nouvelle ou brouillon du catalogue) : recommandations et recherche
+    de ce db la voient aussitôt. Dans une session, seuls sa liste et son index forké changent
+    (ajout incrémental, la base partagée n’est pas modifiée) ; le backend persiste la
+    ressource pour les prochains lancements.
+    """
+    resource = {**resource, "visibility": "Publié"}
+    db["backend"].save_resource(resource)
+    resources = [resource if r["id"] == resource["id"] else r for r in db["resources"]]
+    if not any(r is resource for r in resources):
+        resources.append(resource)
+    db["resources"] = resources
+    db["resource_index"].add(resource)
+    return resource
 
 # --- Profil & Partages (widgets de rendu simple) ---
 
@@ -303,13 +1105,17 @@ def edit_profile(db: dict, pid: str) -> None:
         p["age"] = st.number_input("Âge", 10, 100, p["age"])
         p["poids_kg"] = st.number_input("Poids (kg)", 30, 200, p["poids_kg"])
     with c3:
-        p["email"] = st.text_input("E-mail", value=p["email"])
+        email = st.text_input("E-mail", value=p["email"])
+        if email != p["email"]:
+            db["registry"].set_patient_email(pid, email)
         p["ville"] = st.text_input("Ville", value=p["ville"])
         p["profile"] = st.selectbox("Profil", ["Drépanocytose SS", "Drépanocytose SC", "Porteur AS"],
                                     index=["Drépanocytose SS", "Drépanocytose SC", "Porteur AS"].index(p["profile"]))
+    save_patient(db, pid)
     st.success("Profil mis à jour (mémoire uniquement).")
 
 def manage_shares(db: dict, pid: str) -> None:
+    registry = db["registry"]
     p = get_patient(db, pid)
     # Affichage par médecin
     for share in p["sharing"]:
@@ -317,12 +1123,13 @@ def manage_shares(db: dict, pid: str) -> None:
         d = get_doctor(db, did)
         st.markdown(f"**{d['prenom']} {d['nom']}** – {d['specialite']}  \n*{d['email']}*")
         cols = st.columns(7)
-        keys = ["risque", "sanguins", "hydratation", "activite", "sommeil", "stress", "douleur"]
+        keys = SHARE_KEYS
         labels = ["Risque", "Sanguins", "Hydratation", "Activité", "Sommeil", "Stress", "Douleur"]
         for c, k, label in zip(cols, keys, labels):
             with c:
-                share["data_access"][k] = st.checkbox(label, value=share["data_access"][k], key=f"{pid}-{did}-{k}")
+                registry.set_access(pid, did, k, st.checkbox(label, value=share["data_access"][k], key=f"{pid}-{did}-{k}"))
         st.divider()
+    save_patient(db, pid)
 
     with st.expander("➕ Ajouter un praticien (simulation)"):
         new_email = st.text_input("E-mail du praticien")
@@ -330,9 +1137,12 @@ def manage_shares(db: dict, pid: str) -> None:
         if st.button("Inviter"):
             if new_email:
                 # création d'un médecin factice et partage par défaut
-                did = f"D{len(db['doctors'])+1:03d}"
-                db["doctors"].append({"id": did, "prenom": "Nouveau", "nom": "PRATICIEN", "specialite": spec, "email": new_email})
-                p["sharing"].append({"doctor_id": did, "data_access": {k: True for k in ["risque","sanguins","hydratation","activite","sommeil","stress","douleur"]}})
+                did = new_id("D")
+                doctor = {"id": did, "prenom": "Nouveau", "nom": "PRATICIEN", "specialite": spec, "email": new_email}
+                db["backend"].add_doctor(doctor)
+                registry.add_doctor(doctor)
+                registry.share(pid, did)
+                save_patient(db, pid)
                 st.success("Invitation envoyée (simulation).")
             else:
                 st.warning("Saisissez une adresse e-mail.")
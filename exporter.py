@@ -1,30 +1,353 @@
 # exporter.py
-# Exports .xlsx via pandas + openpyxl
+# Exports .xlsx via openpyxl (mode write-only, écriture en flux)
+#
+# Les lignes sont lues par blocs dans le SeriesStore et l’index des messages puis écrites
+# directement dans un classeur write-only (feuilles sérialisées au fil de l’eau sur disque) :
+# la mémoire crête ne dépend pas de la longueur de l’historique. Le fichier produit est un
+# fichier temporaire dont l’appelant garde le chemin (et qu’il supprime).
+#
+# Export groupé médecin (export_doctor_cohort) : patients ayant partagé avec le médecin,
+# colonnes limitées aux autorisations de chaque partage, rendu en parallèle (pool de
+# processus, fenêtre bornée) et écriture au fil de l’eau dans une seule archive ZIP.
+#
+#   python exporter.py --doctor D001 --format csv --out export_D001.zip   # BLOOWE_DB requis
 
-import io
+from __future__ import annotations
+import argparse
+import atexit
+import functools
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
-from openpyxl.utils import get_column_letter
+from openpyxl import Workbook
 
 import data
 
-def export_patient_to_excel(db: dict, pid: str) -> bytes:
+CHUNK_ROWS = 4_096
+MESSAGE_FIELDS = ["id", "patient_id", "doctor_id", "sender", "text", "timestamp", "read_by_patient", "read_by_doctor"]
+
+def _cell(v):
+    """Valeur compatible openpyxl : scalaires NumPy/pandas natifs, manquants -> cellule vide."""
+    if v is None or v is pd.NaT:
+        return None
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and v != v:
+        return None
+    return v
+
+def _flatten(d: dict, prefix: str = "") -> dict:
+    """Dicts imbriqués aplatis en colonnes pointées (thresholds.risk_alert, ...)."""
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            out.update(_flatten(v, f"{prefix}{k}."))
+        else:
+            out[f"{prefix}{k}"] = v
+    return out
+
+def profile_row(patient: dict) -> dict:
+    """Profil sur une ligne : seuils / préférences aplatis, partages résumés en ids de médecins."""
+    row = _flatten({k: v for k, v in patient.items() if k != "sharing"})
+    row["sharing"] = ", ".join(s["doctor_id"] for s in patient.get("sharing", []))
+    return row
+
+def share_rows(patient: dict) -> list[dict]:
+    return [{"doctor_id": s["doctor_id"], **{k: s.get("data_access", {}).get(k, False) for k in data.SHARE_KEYS}}
+            for s in patient.get("sharing", [])]
+
+def _frame_rows(chunks: Iterable[pd.DataFrame]):
+    """Lignes Python des blocs (dates en datetime, NaN -> cellule vide)."""
+    for chunk in chunks:
+        cols = []
+        for c in chunk.columns:
+            col = chunk[c]
+            if col.dtype.kind == "M":
+                cols.append(col.dt.to_pydatetime().tolist())
+            else:
+                cols.append(col.astype(object).where(col.notna(), None).tolist())
+        yield from zip(*cols)
+
+def _series_rows(db: dict, pid: str, chunk_rows: int, columns: list[str] | None = None):
+    """Lignes de la série lues par blocs de chunk_rows dans le SeriesStore."""
+    store = db["series"]
+    return _frame_rows(store.frame(pid, start, start + chunk_rows, columns)
+                       for start in range(0, store.n_rows(pid), chunk_rows))
+
+def _write_workbook(dest: str | os.PathLike, sheets: list[tuple[str, list, Iterable]]) -> Path:
+    """Classeur write-only : une feuille par (nom, en-tête, lignes), lignes consommées en flux."""
+    wb = Workbook(write_only=True)
+    for name, header, rows in sheets:
+        ws = wb.create_sheet(name)
+        ws.append(header)
+        for row in rows:
+            ws.append(row)
+    wb.save(dest)
+    return Path(dest)
+
+def write_patient_workbook(db: dict, pid: str, dest: str | os.PathLike, chunk_rows: int = CHUNK_ROWS) -> Path:
+    """Écrit le classeur du patient (Profil, Series, Messages, Partages) dans `dest`, en flux."""
     patient = data.get_patient(db, pid)
-    series = data.get_series(db, pid)
-    messages = [m for m in db["messages"] if m["patient_id"] == pid]
-
-    # Partages -> DataFrame
-    shares = []
-    for s in patient.get("sharing", []):
-        row = {"doctor_id": s["doctor_id"], **s.get("data_access", {})}
-        shares.append(row)
-    df_shares = pd.DataFrame(shares) if shares else pd.DataFrame(columns=["doctor_id"])
-
-    bio = io.BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        pd.DataFrame([patient]).to_excel(writer, index=False, sheet_name="Profil")
-        series.to_excel(writer, index=False, sheet_name="Series")
-        pd.DataFrame(messages).to_excel(writer, index=False, sheet_name="Messages")
-        df_shares.to_excel(writer, index=False, sheet_name="Partages")
-    bio.seek(0)
-    return bio.getvalue()
+    profile = profile_row(patient)
+    return _write_workbook(dest, [
+        ("Profil", list(profile), [[_cell(v) for v in profile.values()]]),
+        ("Series", list(db["series"].frame(pid, 0, 0).columns), _series_rows(db, pid, chunk_rows)),
+        ("Messages", MESSAGE_FIELDS, ([_cell(m.get(f)) for f in MESSAGE_FIELDS] for m in db["messages"].for_patient(pid))),
+        ("Partages", ["doctor_id", *data.SHARE_KEYS], (list(s.values()) for s in share_rows(patient))),
+    ])
+
+def export_patient_to_file(db: dict, pid: str, directory: str | os.PathLike | None = None) -> Path:
+    """Export dans un fichier temporaire (sur disque, jamais en RAM) ; renvoie son chemin."""
+    fd, path = tempfile.mkstemp(prefix=f"export_{pid}_", suffix=".xlsx", dir=directory)
+    os.close(fd)
+    try:
+        return write_patient_workbook(db, pid, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+def _drop_export(path: Path) -> None:
+    path.unlink(missing_ok=True)
+
+# exports déjà produits, réutilisés tant que le patient n’a pas changé (fichiers supprimés à l’éviction)
+EXPORT_CACHE = data.ViewCache(maxsize=32, on_evict=_drop_export)
+atexit.register(EXPORT_CACHE.clear)
+
+def export_patient_cached(db: dict, pid: str) -> Path:
+    """Export du patient, recalculé seulement si une de ses versions (série, messages, profil, partages) a changé."""
+    key = ("export_patient_to_file", pid, db["versions"].of(pid))
+    return EXPORT_CACHE.get_or_compute(key, lambda: export_patient_to_file(db, pid), valid=Path.exists)
+
+def read_export(db: dict, pid: str, path: str | os.PathLike) -> bytes:
+    """
+    Contenu d’un export déjà produit ; si le fichier temporaire a disparu entre-temps
+    (éviction du cache, nettoyage de /tmp), l’export est refait.
+    """
+    try:
+        return Path(path).read_bytes()
+    except FileNotFoundError:
+        return export_patient_cached(db, pid).read_bytes()
+
+def export_patient_to_excel(db: dict, pid: str) -> bytes:
+    """Variante en octets (compatibilité) : export en flux puis lecture du fichier."""
+    path = export_patient_to_file(db, pid)
+    try:
+        return path.read_bytes()
+    finally:
+        path.unlink()
+
+# ----------------------- Export groupé (médecin) ----------------------------
+
+PROFILE_DTYPES = {
+    "id": "string", "prenom": "string", "nom": "string", "email": "string", "sexe": "string",
+    "age": "Int16", "taille_cm": "Int16", "poids_kg": "Float32", "ville": "string", "profile": "string",
+    "thresholds.risk_alert": "Float32", "notification_prefs.risk_alerts": "boolean",
+    "notification_prefs.daily_reminder": "boolean", "notification_prefs.tips": "boolean", "active": "boolean",
+}
+MESSAGE_DTYPES = {
+    "id": "string", "patient_id": "string", "doctor_id": "string", "sender": "string", "text": "string",
+    "timestamp": "datetime64[ns]", "read_by_patient": "boolean", "read_by_doctor": "boolean",
+}
+# toutes les colonnes partageables, en types nullables (colonne non autorisée -> vide)
+SERIES_DTYPES = {"patient_id": "string", "date": "datetime64[ns]", **{
+    c: ("Float32" if np.dtype(data.SERIES_SCHEMA[c]).kind == "f" else "Int16")
+    for k in data.SHARE_KEYS for c in data.SHARE_COLUMNS[k]}}
+FORMATS = ("xlsx", "csv", "parquet")
+
+def doctor_patients(db: dict, did: str) -> dict[str, dict]:
+    """Patients actifs ayant partagé avec le médecin -> data_access."""
+    registry = db["registry"]
+    return {pid: acc for pid, acc in registry.shared_with(did).items()
+            if registry.patients[pid].get("active", True)}
+
+def _payload(db: dict, did: str, pid: str, access: dict) -> dict:
+    """Données d’un patient restreintes au partage (seul ce bloc transite vers le processus de rendu)."""
+    profile = profile_row(db["registry"].patients[pid])  # lecture seule : pas de copie en overlay
+    profile.pop("sharing")
+    return {
+        "pid": pid, "did": did, "profile": profile,
+        "access": {k: bool(access.get(k)) for k in data.SHARE_KEYS},
+        "series": db["series"].frame(pid, columns=["date", *data.shared_columns(access)]),
+        "messages": [{f: m.get(f) for f in MESSAGE_FIELDS} for m in db["messages"].thread(pid, did)],
+    }
+
+def _tables(payloads: list[dict]) -> dict[str, pd.DataFrame]:
+    """Blocs consolidés d’un lot de patients au schéma fixe de l’export (colonnes non partagées vides)."""
+    series = pd.concat([p["series"].assign(patient_id=p["pid"]) for p in payloads], ignore_index=True)
+    return {
+        "patients": pd.DataFrame([p["profile"] for p in payloads], columns=list(PROFILE_DTYPES)).astype(PROFILE_DTYPES),
+        "series": series.reindex(columns=list(SERIES_DTYPES)).astype(SERIES_DTYPES),
+        "messages": pd.DataFrame([m for p in payloads for m in p["messages"]], columns=MESSAGE_FIELDS).astype(MESSAGE_DTYPES),
+    }
+
+def _render_xlsx(payload: dict, directory: str) -> tuple[str, str]:
+    path = os.path.join(directory, f"{payload['pid']}.xlsx")
+    profile, series = payload["profile"], payload["series"]
+    _write_workbook(path, [
+        ("Profil", list(profile), [[_cell(v) for v in profile.values()]]),
+        ("Series", list(series.columns),
+         _frame_rows(series.iloc[i:i + CHUNK_ROWS] for i in range(0, len(series), CHUNK_ROWS))),
+        ("Messages", MESSAGE_FIELDS, ([_cell(m[f]) for f in MESSAGE_FIELDS] for m in payload["messages"])),
+        ("Partage", ["doctor_id", *data.SHARE_KEYS], [[payload["did"], *payload["access"].values()]]),
+    ])
+    return payload["pid"], path
+
+def _render_batch(payloads: list[dict], fmt: str, directory: str):
+    """Rendu d’un lot de patients (dans un processus du pool) : (taille du lot, chemins xlsx ou blocs consolidés)."""
+    if fmt == "xlsx":
+        return len(payloads), [_render_xlsx(p, directory) for p in payloads]
+    blocks = _tables(payloads)
+    if fmt == "csv":
+        blocks = {name: df.to_csv(index=False, header=False).encode("utf-8") for name, df in blocks.items()}
+    return len(payloads), blocks
+
+class _CsvSink:
+    """CSV consolidé dans un fichier temporaire (disque) : en-tête puis blocs déjà sérialisés."""
+
+    def __init__(self, columns: list[str]):
+        self.file = tempfile.TemporaryFile()
+        self.file.write((",".join(columns) + "\n").encode("utf-8"))
+
+    def write(self, block: bytes) -> None:
+        self.file.write(block)
+
+    def close(self, zf: zipfile.ZipFile, arcname: str) -> None:
+        self.file.seek(0)
+        with zf.open(arcname, "w") as out:
+            while chunk := self.file.read(1 << 20):
+                out.write(chunk)
+        self.file.close()
+
+class _ParquetSink:
+    """Parquet consolidé dans un fichier temporaire ; blocs regroupés en row groups de ~row_group lignes."""
+
+    def __init__(self, directory: str, name: str, dtypes: dict, row_group: int = 65_536):
+        import pyarrow as pa  # chargé seulement pour le format parquet
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.path = os.path.join(directory, f"{name}.parquet")
+        empty = pd.DataFrame({c: pd.Series(dtype=t) for c, t in dtypes.items()})
+        self.schema = pa.Schema.from_pandas(empty, preserve_index=False)
+        self.writer = pq.ParquetWriter(self.path, self.schema)
+        self.row_group = row_group
+        self.pending: list[pd.DataFrame] = []
+        self.n_pending = 0
+
+    def write(self, block: pd.DataFrame) -> None:
+        self.pending.append(block)
+        self.n_pending += len(block)
+        if self.n_pending >= self.row_group:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.pending:
+            frame = pd.concat(self.pending, ignore_index=True)
+            self.writer.write_table(self.pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+            self.pending, self.n_pending = [], 0
+
+    def close(self, zf: zipfile.ZipFile, arcname: str) -> None:
+        self._flush()
+        self.writer.close()
+        zf.write(self.path, arcname)
+        os.unlink(self.path)
+
+def _imap(fn: Callable, items: Iterable, workers: int) -> Iterator:
+    """map ordonné sur un pool de processus, au plus 2 × workers tâches en vol (mémoire bornée)."""
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def export_doctor_cohort(db: dict, did: str, dest: str | os.PathLike, fmt: str = "xlsx", workers: int | None = None,
+                         progress: Callable[[int, int], None] | None = None, batch_size: int = 32) -> Path:
+    """
+    Archive ZIP des patients ayant partagé avec le médecin `did`, colonnes limitées à chaque partage.
+      - xlsx : un classeur par patient (Profil, Series, Messages du fil avec ce médecin, Partage) ;
+      - csv / parquet : fichiers consolidés patients, series (schéma fixe, colonnes non partagées
+        vides) et messages.
+    Rendu par lots de batch_size patients sur `workers` processus (défaut : cœurs disponibles,
+    4 au plus ; 1 = sans pool) ; progress(fait, total) est appelé après chaque lot.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format inconnu : {fmt!r} (attendu : {', '.join(FORMATS)})")
+    workers = min(4, os.cpu_count() or 1) if workers is None else workers
+    patients = doctor_patients(db, did)
+    payloads = (_payload(db, did, pid, acc) for pid, acc in patients.items())
+
+    with tempfile.TemporaryDirectory(prefix="bloowe_export_") as tmp, \
+            zipfile.ZipFile(dest, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        render = functools.partial(_render_batch, fmt=fmt, directory=tmp)
+        if fmt == "csv":
+            sinks = {"patients": _CsvSink(list(PROFILE_DTYPES)), "series": _CsvSink(list(SERIES_DTYPES)),
+                     "messages": _CsvSink(MESSAGE_FIELDS)}
+        elif fmt == "parquet":
+            sinks = {name: _ParquetSink(tmp, name, dtypes) for name, dtypes in
+                     (("patients", PROFILE_DTYPES), ("series", SERIES_DTYPES), ("messages", MESSAGE_DTYPES))}
+        else:
+            sinks = {}
+
+        done = 0
+        for n, result in _imap(render, _batches(payloads, batch_size), workers):
+            if fmt == "xlsx":
+                for pid, path in result:
+                    zf.write(path, f"{did}/{pid}.xlsx")
+                    os.unlink(path)
+            else:
+                for name, block in result.items():
+                    sinks[name].write(block)
+            done += n
+            if progress:
+                progress(done, len(patients))
+        for name, sink in sinks.items():
+            sink.close(zf, f"{did}/{name}.{fmt}")
+    return Path(dest)
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Export groupé des patients ayant partagé avec un médecin")
+    ap.add_argument("--doctor", required=True)
+    ap.add_argument("--format", choices=FORMATS, default="xlsx")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--out", required=True, help="archive ZIP à écrire")
+    args = ap.parse_args()
+
+    import storage
+    db = data.open_db(storage.open_backend())
+    t0 = time.perf_counter()
+
+    def report(done: int, total: int) -> None:
+        print(f"\r{done}/{total} patients", end="", file=sys.stderr, flush=True)
+
+    export_doctor_cohort(db, args.doctor, args.out, args.format, args.workers, report)
+    print(f"\n-> {args.out} en {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
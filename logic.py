@@ -11,7 +11,7 @@ import data
 
 def init_state(db: dict) -> None:
     if "selected_patient_id" not in st.session_state:
-        st.session_state.selected_patient_id = db["patients"][0]["id"]
+        st.session_state.selected_patient_id = data.list_patients(db)[0]["id"]
     if "selected_doctor_id" not in st.session_state:
         st.session_state.selected_doctor_id = None
     if "date_to" not in st.session_state:
@@ -54,4 +54,5 @@ def can_export_patient(pid: str) -> tuple[bool, str]:
 def simulate_delete_account(db: dict, pid: str) -> None:
     p = data.get_patient(db, pid)
     p["active"] = False  # masque le patient de la sélection (POC)
+    data.save_patient(db, pid)
 
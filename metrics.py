@@ -0,0 +1,128 @@
+# metrics.py
+# Instrumentation opt-in : chronos par étape, compteurs et histogrammes en mémoire (process)
+#
+# Activation : variable d’environnement BLOOWE_METRICS=1, ou metrics.enable() à chaud.
+# Désactivé, chaque point de mesure coûte un test booléen (timer() renvoie un contexte vide).
+
+from __future__ import annotations
+import bisect
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+# Bornes (incluses) des buckets : durées en ms, tailles (lignes, fenêtres, lots) en unités
+MS_BOUNDS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SIZE_BOUNDS = tuple(2 ** k for k in range(0, 21))
+
+class Histogram:
+    """Histogramme à buckets fixes (+ débordement) ; quantiles estimés par interpolation."""
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i-1] if i > 0 else self.min
+                hi = self.bounds[i] if i < len(self.bounds) else self.max
+                lo, hi = max(lo, self.min), min(hi, self.max)
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.max
+
+    def snapshot(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count, "sum": self.total, "mean": self.total / self.count,
+            "min": self.min, "max": self.max,
+            "p50": self.quantile(0.50), "p95": self.quantile(0.95), "p99": self.quantile(0.99),
+            "buckets": {("+inf" if i == len(self.bounds) else str(self.bounds[i])): c
+                        for i, c in enumerate(self.counts) if c},
+        }
+
+class MetricsRegistry:
+    """Registre thread-safe : histogrammes (durées *_ms, tailles) et compteurs cumulés."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._hists: dict[str, Histogram] = {}
+        self._counters: dict[str, int] = {}
+
+    def observe(self, name: str, value: float, bounds: tuple[float, ...] | None = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            h = self._hists.get(name)
+            if h is None:
+                h = self._hists[name] = Histogram(bounds or (MS_BOUNDS if name.endswith("_ms") else SIZE_BOUNDS))
+            h.observe(value)
+
+    def inc(self, name: str, n: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + int(n)
+
+    @contextlib.contextmanager
+    def _timer(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_ms", (time.perf_counter() - t0) * 1e3)
+
+    def timer(self, name: str):
+        """with REGISTRY.timer("predict.transform"): ... -> histogramme predict.transform_ms"""
+        return self._timer(name) if self.enabled else contextlib.nullcontext()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "timestamp": time.time(),
+                "counters": dict(sorted(self._counters.items())),
+                "histograms": {k: h.snapshot() for k, h in sorted(self._hists.items())},
+            }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hists.clear()
+            self._counters.clear()
+
+REGISTRY = MetricsRegistry(enabled=os.environ.get("BLOOWE_METRICS", "") == "1")
+
+def enable(on: bool = True) -> None:
+    REGISTRY.enabled = on
+
+def timer(name: str):
+    return REGISTRY.timer(name)
+
+def observe(name: str, value: float) -> None:
+    REGISTRY.observe(name, value)
+
+def inc(name: str, n: int = 1) -> None:
+    REGISTRY.inc(name, n)
@@ -1,25 +1,258 @@
 # model_service.py
 from __future__ import annotations
+import functools
+import json
 import os
+import queue
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 import joblib
 
+import metrics
+
 # ⚠️ IMPORTANT : sécurité pickle/joblib
 # Ne charger que des fichiers de confiance.
 
+# -------- Backend LSTM sans TensorFlow
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 0.5 * (np.tanh(0.5 * x) + 1.0),  # forme stable (pas d’overflow de exp)
+}
+
+class NumpyLSTM:
+    """
+    Passe avant float32 d’un Sequential Keras (LSTM / Dropout / Dense) en pur NumPy.
+    Les poids sont extraits une fois ; predict() a la même signature que keras.Model.predict.
+    """
+
+    def __init__(self, layers: list[dict]):
+        """layers : [{"type": "lstm"|"dense", "weights": [np.ndarray, ...], "activation": str, ...}]"""
+        self.layers = layers
+
+    @classmethod
+    def from_keras(cls, model) -> NumpyLSTM:
+        """Extrait les poids d’un Sequential ; NotImplementedError si une couche n’est pas gérée."""
+        layers = []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            cfg = layer.get_config()
+            weights = [np.asarray(w, dtype=np.float32) for w in layer.get_weights()]
+            if kind in ("InputLayer", "Dropout"):
+                continue  # Dropout = identité en inférence
+            if kind == "LSTM":
+                if cfg.get("go_backwards") or cfg.get("stateful") or not cfg.get("use_bias", True):
+                    raise NotImplementedError(f"LSTM non géré : {cfg.get('name')}")
+                layers.append({"type": "lstm", "weights": weights, "activation": cfg["activation"],
+                               "recurrent_activation": cfg["recurrent_activation"],
+                               "return_sequences": bool(cfg.get("return_sequences", False))})
+            elif kind == "Dense":
+                if not cfg.get("use_bias", True):
+                    weights.append(np.zeros(weights[0].shape[1], dtype=np.float32))
+                layers.append({"type": "dense", "weights": weights, "activation": cfg["activation"]})
+            else:
+                raise NotImplementedError(f"Couche non gérée par le backend numpy : {kind}")
+        for l in layers:
+            for act in (l["activation"], l.get("recurrent_activation", "linear")):
+                if act not in _ACTIVATIONS:
+                    raise NotImplementedError(f"Activation non gérée : {act}")
+        return cls(layers)
+
+    @staticmethod
+    def _lstm(X: np.ndarray, W: np.ndarray, U: np.ndarray, b: np.ndarray,
+              act, rec_act, return_sequences: bool) -> np.ndarray:
+        n, T, _ = X.shape
+        units = U.shape[0]
+        # projection des entrées pour tous les pas de temps d’un coup (n, T, 4u) ; portes i, f, c, o
+        Z = X @ W + b
+        h = np.zeros((n, units), dtype=np.float32)
+        c = np.zeros((n, units), dtype=np.float32)
+        hs = []
+        for t in range(T):
+            z = Z[:, t] + h @ U
+            i = rec_act(z[:, :units])
+            f = rec_act(z[:, units:2*units])
+            g = act(z[:, 2*units:3*units])
+            o = rec_act(z[:, 3*units:])
+            c = f * c + i * g
+            h = o * act(c)
+            if return_sequences:
+                hs.append(h)
+        return np.stack(hs, axis=1) if return_sequences else h
+
+    def predict(self, X: np.ndarray, verbose: int = 0, batch_size: int | None = None) -> np.ndarray:
+        out = np.asarray(X, dtype=np.float32)
+        for l in self.layers:
+            act = _ACTIVATIONS[l["activation"]]
+            if l["type"] == "lstm":
+                W, U, b = l["weights"]
+                out = self._lstm(out, W, U, b, act, _ACTIVATIONS[l["recurrent_activation"]], l["return_sequences"])
+            else:
+                W, b = l["weights"]
+                out = act(out @ W + b)
+        return out
+
+# -------- Preprocessor compilé (plan NumPy figé)
+
+class CompiledPreprocessor:
+    """
+    ColumnTransformer ajusté, figé en plan NumPy : constantes d’imputation, vecteurs
+    affines (x*a + b) pour les numériques et table one-hot pour les catégorielles.
+    Sortie float32 ; compile() lève NotImplementedError si un transformer n’est pas géré.
+    """
+
+    def __init__(self, num_cols: list[str], num_fill: np.ndarray, num_a: np.ndarray, num_b: np.ndarray,
+                 num_pos: np.ndarray, cat_cols: list[str], cat_fill: list, cat_categories: list[list],
+                 cat_pos: list[int], n_out: int):
+        self.num_cols = list(num_cols)
+        self.num_fill = np.asarray(num_fill, dtype=np.float64)
+        self.num_a = np.asarray(num_a, dtype=np.float64)
+        self.num_b = np.asarray(num_b, dtype=np.float64)
+        self.num_pos = np.asarray(num_pos, dtype=np.intp)        # colonne de sortie de chaque numérique
+        self.cat_cols = list(cat_cols)
+        self.cat_fill = list(cat_fill)
+        self.cat_categories = [list(c) for c in cat_categories]
+        self.cat_pos = [int(p) for p in cat_pos]                # 1re colonne one-hot de chaque catégorielle
+        self.n_out = int(n_out)
+        self._cat_index = [pd.Index(c) for c in self.cat_categories]
+
+    @classmethod
+    def compile(cls, pre) -> CompiledPreprocessor:
+        if getattr(pre, "sparse_output_", False):
+            raise NotImplementedError("sortie creuse non gérée")
+        num_cols, num_fill, num_a, num_b, num_pos = [], [], [], [], []
+        cat_cols, cat_fill, cat_categories, cat_pos = [], [], [], []
+        pos = 0
+        for name, trans, cols in pre.transformers_:
+            if isinstance(trans, str) and trans == "drop":
+                continue
+            cols = list(cols)
+            if not all(isinstance(c, str) for c in cols):
+                raise NotImplementedError(f"{name} : colonnes non nommées")
+            if isinstance(trans, str) and trans == "passthrough":
+                steps = []
+            elif type(trans).__name__ == "Pipeline":
+                steps = [t for _, t in trans.steps if not (isinstance(t, str) and t == "passthrough")]
+            else:
+                steps = [trans]
+
+            fill = np.full(len(cols), np.nan, dtype=object)
+            a, b = np.ones(len(cols)), np.zeros(len(cols))
+            onehot = None
+            for i, step in enumerate(steps):
+                kind = type(step).__name__
+                if kind == "SimpleImputer":
+                    if i != 0 or step.add_indicator or not (step.missing_values is np.nan
+                                                            or pd.isna(step.missing_values)):
+                        raise NotImplementedError(f"{name} : SimpleImputer non géré")
+                    fill = np.asarray(step.statistics_, dtype=object)
+                elif kind == "StandardScaler":
+                    mean = step.mean_ if step.mean_ is not None else 0.0
+                    scale = step.scale_ if step.scale_ is not None else 1.0
+                    a, b = a / scale, (b - mean) / scale
+                elif kind == "MinMaxScaler" and not step.clip:
+                    a, b = a * step.scale_, b * step.scale_ + step.min_
+                elif kind == "OneHotEncoder" and i == len(steps) - 1:
+                    if step.drop_idx_ is not None or getattr(step, "_infrequent_enabled", False) \
+                            or step.handle_unknown != "ignore":
+                        raise NotImplementedError(f"{name} : OneHotEncoder non géré")
+                    onehot = step
+                else:
+                    raise NotImplementedError(f"{name} : étape {kind} non gérée")
+
+            if onehot is not None:
+                if (a != 1).any() or (b != 0).any():
+                    raise NotImplementedError(f"{name} : mise à l’échelle avant one-hot")
+                for j, c in enumerate(cols):
+                    cats = list(onehot.categories_[j])
+                    cat_cols.append(c); cat_fill.append(fill[j]); cat_categories.append(cats); cat_pos.append(pos)
+                    pos += len(cats)
+            else:
+                fill = np.asarray([np.nan if f is None else f for f in fill], dtype=float)
+                if len(steps) and type(steps[0]).__name__ == "SimpleImputer" and np.isnan(fill).any():
+                    raise NotImplementedError(f"{name} : colonne vide à l’ajustement (retirée par l’imputer)")
+                for j, c in enumerate(cols):
+                    num_cols.append(c); num_fill.append(fill[j]); num_a.append(a[j]); num_b.append(b[j])
+                    num_pos.append(pos)
+                    pos += 1
+        return cls(num_cols, num_fill, num_a, num_b, num_pos, cat_cols, cat_fill, cat_categories, cat_pos, pos)
+
+    def to_dict(self) -> dict:
+        """Paramètres sérialisables en JSON (NaN -> None)."""
+        nan_none = lambda v: [None if np.isnan(x) else float(x) for x in v]
+        return {
+            "num_cols": self.num_cols, "num_fill": nan_none(self.num_fill),
+            "num_a": nan_none(self.num_a), "num_b": nan_none(self.num_b),
+            "num_pos": [int(p) for p in self.num_pos],
+            "cat_cols": self.cat_cols, "cat_fill": [None if pd.isna(f) else f for f in self.cat_fill],
+            "cat_categories": self.cat_categories, "cat_pos": self.cat_pos, "n_out": self.n_out,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> CompiledPreprocessor:
+        none_nan = lambda v: [np.nan if x is None else x for x in v]
+        return cls(d["num_cols"], none_nan(d["num_fill"]), none_nan(d["num_a"]), none_nan(d["num_b"]),
+                   d["num_pos"], d["cat_cols"], none_nan(d["cat_fill"]), d["cat_categories"],
+                   d["cat_pos"], d["n_out"])
+
+    def transform_arrays(self, num: np.ndarray, cat: np.ndarray | list) -> np.ndarray:
+        """
+        num : (n, len(num_cols)) float32/float64 dans l’ordre de num_cols ; cat : (n, len(cat_cols)) valeurs brutes.
+        Retourne X (n, n_out) float32, identique (à l’arrondi float32 près) à pre.transform.
+        """
+        num = np.asarray(num, dtype=np.float64).reshape(-1, len(self.num_cols))
+        n = len(num)
+        out = np.zeros((n, self.n_out), dtype=np.float32)
+        if len(self.num_cols):
+            # calcul affine en float64 puis arrondi float32 : mêmes valeurs que celles
+            # que XGB / le LSTM reçoivent après conversion de la sortie sklearn
+            num = np.where(np.isnan(num), self.num_fill, num)
+            out[:, self.num_pos] = num * self.num_a + self.num_b
+        if len(self.cat_cols):
+            cat = np.asarray(cat, dtype=object).reshape(n, len(self.cat_cols))
+            rows = np.arange(n)
+            for j, (fill, index, base) in enumerate(zip(self.cat_fill, self._cat_index, self.cat_pos)):
+                values = cat[:, j] if pd.isna(fill) else pd.Series(cat[:, j]).fillna(fill).to_numpy()
+                codes = index.get_indexer(values)
+                known = codes >= 0  # inconnu -> ligne de zéros (handle_unknown="ignore")
+                out[rows[known], base + codes[known]] = 1.0
+        return out
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        return self.transform_arrays(df[self.num_cols].to_numpy(dtype=np.float64),
+                                     df[self.cat_cols].to_numpy(dtype=object))
+
+    def transform_record(self, rec: dict) -> np.ndarray:
+        """Une seule ligne (dict) -> (1, n_out), sans passer par un DataFrame."""
+        num = np.array([[np.nan if rec.get(c) is None else rec.get(c) for c in self.num_cols]], dtype=np.float64)
+        return self.transform_arrays(num, [[rec.get(c) for c in self.cat_cols]])
+
 class CrisisRiskModel:
-    def __init__(self, artifacts: dict, alpha: float = 0.6):
+    def __init__(self, artifacts: dict, alpha: float = 0.6, latest_cache_size: int = 10_000,
+                 lstm_backend: str = "auto", compile_preprocessor: bool = True):
         """
         artifacts : dict attendu avec clés :
-          - preprocessor : ColumnTransformer
+          - preprocessor : ColumnTransformer (ou CompiledPreprocessor, format dossier)
           - seq_length : int
           - feature_input_cols : list[str]
           - numeric_features : list[str]
           - categorical_features : list[str] (ex: ["Genotype"])
-          - lstm_model : tf.keras.Model (optionnel si sauvé à part)
+          - lstm_model : tf.keras.Model (optionnel si sauvé à part) ou NumpyLSTM (format dossier)
           - xgb_model : xgboost.XGBClassifier (ou sklearn-like)
         alpha : pondération LSTM (alpha) vs tabulaire (1-alpha)
+        latest_cache_size : nb max de patients gardés dans le cache de predict_latest (LRU)
+        lstm_backend : "keras" (TensorFlow), "numpy" (NumpyLSTM, poids extraits au chargement)
+                       ou "auto" (numpy si toutes les couches sont gérées, sinon keras)
+        compile_preprocessor : fige le ColumnTransformer en plan NumPy (repli sklearn si non géré)
         """
         self.pre = artifacts.get("preprocessor")
         self.seq_length = int(artifacts.get("seq_length", 14))
@@ -29,85 +262,470 @@ class CrisisRiskModel:
         self.lstm = artifacts.get("lstm_model", None)
         self.xgb = artifacts.get("xgb_model", None)
         self.alpha = float(alpha)
+        self._pre_compiled: CompiledPreprocessor | None = None
+        if isinstance(self.pre, CompiledPreprocessor):
+            self._pre_compiled = self.pre
+        elif self.pre is not None and compile_preprocessor:
+            try:
+                self._pre_compiled = CompiledPreprocessor.compile(self.pre)
+            except (NotImplementedError, AttributeError):
+                pass  # repli : self.pre.transform (sklearn)
+        self.lstm_backend = "keras"
+        self._lstm_np: NumpyLSTM | None = None
+        if isinstance(self.lstm, NumpyLSTM):
+            # format dossier : poids déjà extraits, pas de modèle Keras disponible
+            if lstm_backend == "keras":
+                raise ValueError("lstm_backend='keras' impossible : artefact au format dossier (poids NumPy "
+                                 "seulement), charger le .pkl d’origine")
+            self._lstm_np, self.lstm_backend = self.lstm, "numpy"
+        elif self.lstm is not None and lstm_backend != "keras":
+            try:
+                self._lstm_np = NumpyLSTM.from_keras(self.lstm)
+                self.lstm_backend = "numpy"
+            except NotImplementedError:
+                if lstm_backend == "numpy":
+                    raise
+        # cache incrémental pid -> (dates, X transformé) limité aux seq_length derniers jours
+        self.latest_cache_size = int(latest_cache_size)
+        # clé (scope, pid) -> (features catégorielles, dates, X) : le modèle est partagé par le
+        # process, scope isole chaque db / session
+        self._latest_cache: OrderedDict[tuple, tuple[tuple, np.ndarray, np.ndarray]] = OrderedDict()
+        self._latest_lock = threading.Lock()
 
     def _make_sequences(self, X_all: np.ndarray) -> np.ndarray:
-        """Fabrique des fenêtres (n-seq, seq_len, n_feat) sur X_all déjà transformé."""
-        L = self.seq_length
-        X_seq = []
-        for i in range(L-1, len(X_all)):
-            window = X_all[i-(L-1):i+1]
-            X_seq.append(window)
-        return np.array(X_seq) if X_seq else np.empty((0, L, X_all.shape[1]))
-
-    def predict_proba_series(self, df_patient: pd.DataFrame) -> pd.Series:
         """
-        df_patient : trié par date croissante, doit contenir les colonnes feature_input_cols.
-        Retourne une Series alignée sur df_patient["date"] avec proba (0..1).
+        Fenêtres (n-seq, seq_len, n_feat) sur X_all déjà transformé.
+        Vue strided en lecture seule : aucune ligne n’est recopiée (cf. _as_batch).
         """
-        assert "date" in df_patient.columns, "df_patient doit contenir une colonne 'date'."
-        # 1) complétion des colonnes attendues
+        L = self.seq_length
+        X_all = np.asarray(X_all)
+        if len(X_all) < L:
+            return np.empty((0, L, X_all.shape[1]), dtype=X_all.dtype)
+        # sliding_window_view -> (n-seq, n_feat, seq_len) ; on remet le temps en axe 1
+        return sliding_window_view(X_all, L, axis=0).transpose(0, 2, 1)
+
+    @staticmethod
+    def _as_batch(X_seq: np.ndarray) -> np.ndarray:
+        """Matérialise les fenêtres en un lot contigu float32 (une seule copie, côté backend)."""
+        return np.ascontiguousarray(X_seq, dtype=np.float32)
+
+    def _complete_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Ajoute (en place) les colonnes attendues absentes avec des défauts raisonnables."""
         for c in self.feature_input_cols:
-            if c not in df_patient.columns:
+            if c not in df.columns:
                 # défauts raisonnables (à ajuster selon ton dataset)
-                df_patient[c] = 0 if c not in self.categorical_features else "SS"
+                df[c] = 0 if c not in self.categorical_features else "SS"
+        return df
 
-        # 2) preprocess tabulaire
-        X_all = self.pre.transform(df_patient[self.feature_input_cols])
-        # X_all est (n_day, n_feat_encodés)
-        # 3) séquences pour LSTM
-        X_seq = self._make_sequences(X_all)
+    def _transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Preprocess tabulaire (n_day, n_feat_encodés) : plan compilé si dispo, sinon sklearn."""
+        if self._pre_compiled is not None:
+            return self._pre_compiled.transform(df)
+        return np.asarray(self.pre.transform(df[self.feature_input_cols]))
 
+    def _transform_record(self, rec: dict) -> np.ndarray:
+        if self._pre_compiled is not None:
+            rec = {c: rec.get(c, 0 if c not in self.categorical_features else "SS") for c in self.feature_input_cols}
+            return self._pre_compiled.transform_record(rec)
+        return self._transform(self._complete_columns(pd.DataFrame([rec])))
+
+    def _predict_windows(self, X_seq: np.ndarray) -> np.ndarray:
+        """Proba hybride (0..1) de chaque fenêtre (n-seq, seq_len, n_feat), jugée sur son dernier jour."""
         # 4) prédictions tabulaires (dernier jour de chaque fenêtre)
+        metrics.observe("predict.batch_windows", len(X_seq))
         p_tab = None
-        if self.xgb is not None:
-            # on prend la ligne correspondante à chaque fenêtre (dernier index)
-            idx_last_each_window = list(range(self.seq_length-1, len(df_patient)))
-            X_tab = X_all[idx_last_each_window]
-            if hasattr(self.xgb, "predict_proba"):
-                p_tab = self.xgb.predict_proba(X_tab)[:, 1]
-            else:
-                # fallback pour modèles régressifs
-                p_tab = self.xgb.predict(X_tab).ravel()
+        if self.xgb is not None and len(X_seq) > 0:
+            X_tab = X_seq[:, -1, :]
+            with metrics.timer("predict.xgb"):
+                if hasattr(self.xgb, "predict_proba"):
+                    p_tab = self.xgb.predict_proba(X_tab)[:, 1]
+                else:
+                    # fallback pour modèles régressifs
+                    p_tab = self.xgb.predict(X_tab).ravel()
 
         # 5) prédictions LSTM (si dispo)
         p_seq = None
         if (self.lstm is not None) and (len(X_seq) > 0):
-            import tensorflow as tf  # import tardif pour éviter coût si non nécessaire
-            p = self.lstm.predict(X_seq, verbose=0)
+            with metrics.timer(f"predict.lstm_{self.lstm_backend}"):
+                if self._lstm_np is not None:
+                    p = self._lstm_np.predict(X_seq)
+                else:
+                    import tensorflow as tf  # import tardif pour éviter coût si non nécessaire
+                    p = self.lstm.predict(self._as_batch(X_seq), verbose=0)
             p_seq = p.reshape(-1)
 
         # 6) combinaison
         if p_seq is not None and p_tab is not None:
-            p_h = self.alpha * p_seq + (1.0 - self.alpha) * p_tab
-        elif p_seq is not None:
-            p_h = p_seq
-        elif p_tab is not None:
-            p_h = p_tab
-        else:
-            # rien ne marche : retourner 0.0
-            p_h = np.zeros(max(0, len(df_patient) - (self.seq_length - 1)))
-
-        # 7) ré-alignement sur toutes les dates (les (L-1) 1ers jours n’ont pas de séquence)
-        out = pd.Series(index=df_patient.index, dtype=float)
+            return self.alpha * p_seq + (1.0 - self.alpha) * p_tab
+        if p_seq is not None:
+            return p_seq
+        if p_tab is not None:
+            return p_tab
+        # rien ne marche : retourner 0.0
+        return np.zeros(len(X_seq))
+
+    def predict_proba_series(self, df_patient: pd.DataFrame) -> pd.Series:
+        """
+        df_patient : trié par date croissante, doit contenir les colonnes feature_input_cols.
+        Retourne une Series alignée sur df_patient["date"] avec proba (0..1).
+        """
+        assert "date" in df_patient.columns, "df_patient doit contenir une colonne 'date'."
+        metrics.inc("predict.series_calls")
+        metrics.observe("predict.rows", len(df_patient))
+        with metrics.timer("predict.series"):
+            # 1) complétion des colonnes attendues
+            with metrics.timer("predict.complete_columns"):
+                self._complete_columns(df_patient)
+
+            # 2) preprocess tabulaire
+            with metrics.timer("predict.transform"):
+                X_all = self._transform(df_patient)
+            # X_all est (n_day, n_feat_encodés)
+            # 3) séquences pour LSTM
+            with metrics.timer("predict.sequences"):
+                X_seq = self._make_sequences(X_all)
+            # 4–6) XGB + LSTM + combinaison
+            p_h = self._predict_windows(X_seq)
+
+            # 7) ré-alignement sur toutes les dates
+            with metrics.timer("predict.align"):
+                return self._align(p_h, df_patient.index)
+
+    def _align(self, p_h: np.ndarray, index: pd.Index) -> pd.Series:
+        """Ré-aligne les probas de fenêtres sur toutes les dates (les (L-1) 1ers jours n’ont pas de séquence)."""
+        out = pd.Series(index=index, dtype=float)
         # pour les premiers jours : on propage la première proba dispo (ou 0.0)
         first_val = float(p_h[0]) if len(p_h) else 0.0
         out.iloc[:self.seq_length-1] = first_val
-        out.iloc[self.seq_length-1:] = p_h
+        if len(p_h):
+            out.iloc[self.seq_length-1:] = p_h
         # clamp (au cas où)
         return out.clip(0.0, 1.0)
 
-# -------- API module-level avec cache Streamlit
-_model_cache = None
+    # ----- Scoring de cohorte (plusieurs patients en un lot) -----
+
+    def predict_proba_cohort(self, frames: dict[str, pd.DataFrame]) -> dict[str, pd.Series]:
+        """
+        frames : {pid: df_patient} (colonne 'date' + features, ordre quelconque).
+        Empile toutes les lignes puis toutes les fenêtres : un seul passage preprocessor,
+        un seul appel XGB et un seul appel LSTM pour toute la cohorte.
+        Retourne {pid: Series de proba (0..1)} indexée comme df_patient, dans l’ordre des dates.
+        """
+        L = self.seq_length
+        pids = list(frames)
+        if not pids:
+            return {}
+        metrics.inc("predict.cohort_calls")
+        metrics.observe("predict.cohort_patients", len(pids))
+        with metrics.timer("predict.cohort"):
+            with metrics.timer("predict.complete_columns"):
+                parts = [self._complete_columns(frames[pid].sort_values("date").copy()) for pid in pids]
+            lengths = np.array([len(p) for p in parts])
+            starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            metrics.observe("predict.rows", int(lengths.sum()))
+
+            # 1 seul passage du preprocessor sur toutes les lignes
+            with metrics.timer("predict.transform"):
+                X_all = self._transform(pd.concat([p[self.feature_input_cols] for p in parts], ignore_index=True))
+
+            # fenêtres qui ne chevauchent pas deux patients : début dans [start, start+n-L]
+            with metrics.timer("predict.sequences"):
+                n_win = np.maximum(lengths - (L - 1), 0)
+                win_starts = np.concatenate([np.arange(s, s + k) for s, k in zip(starts, n_win)]).astype(np.intp)
+                X_seq = self._make_sequences(X_all)[win_starts] if len(win_starts) else self._make_sequences(X_all[:0])
+
+            # 1 seul appel XGB / LSTM pour tous les patients
+            p_h = self._predict_windows(X_seq)
+
+            with metrics.timer("predict.align"):
+                out = {}
+                bounds = np.concatenate([[0], np.cumsum(n_win)])
+                for pid, part, a, b in zip(pids, parts, bounds[:-1], bounds[1:]):
+                    out[pid] = self._align(p_h[a:b], part.index)
+        return out
+
+    def warm_up(self) -> None:
+        """Inférence factice (1 fenêtre) : déclenche imports et traçage du graphe TF une fois pour toutes."""
+        n = max(self.seq_length, 1)
+        dummy = pd.DataFrame({"date": pd.date_range(end=pd.Timestamp.today().normalize(), periods=n, freq="D")})
+        self.predict_proba_series(dummy)
+
+    # ----- Scoring incrémental (dernier jour) -----
+
+    def predict_latest(self, pid: str, new_row: dict | pd.Series,
+                       history: pd.DataFrame | Callable[[], pd.DataFrame] | None = None,
+                       dispatcher: InferenceDispatcher | None = None, scope: Hashable = None) -> float:
+        """
+        Proba (0..1) du jour de new_row, sans repasser tout l’historique dans le modèle.
+        Le cache patient conserve les seq_length dernières lignes déjà transformées :
+        seule new_row passe dans le preprocessor, puis une unique fenêtre est scorée.
+        history : série du patient (ou callable qui la renvoie), lue seulement pour
+        (ré)amorcer le cache – premier appel ou date antérieure à la dernière connue.
+        Une ligne de même date que la dernière en cache la remplace (ré-saisie du jour).
+        dispatcher : si fourni, la fenêtre est scorée dans un lot partagé avec les
+        requêtes concurrentes (cf. InferenceDispatcher).
+        scope : jeu de données d’où vient history (ex. Versions.scope) ; deux db ou sessions
+        aux mêmes pid ne partagent pas leur cache.
+        """
+        t0 = time.perf_counter()
+        X_seq = self._latest_window(pid, new_row, history, scope)
+        if X_seq is None:
+            # même convention que predict_proba_series : pas de fenêtre complète -> 0.0
+            return 0.0
+        p = dispatcher.submit(self, X_seq).result() if dispatcher is not None else self._predict_windows(X_seq)
+        metrics.observe("predict.latest_ms", (time.perf_counter() - t0) * 1e3)
+        return float(np.clip(p[-1], 0.0, 1.0))
 
-def load_model(pkl_path: str, keras_path: str | None = None, alpha: float = 0.6) -> CrisisRiskModel:
+    def _latest_window(self, pid: str, new_row: dict | pd.Series,
+                       history: pd.DataFrame | Callable[[], pd.DataFrame] | None,
+                       scope: Hashable = None) -> np.ndarray | None:
+        """Met à jour le cache incrémental ; renvoie la fenêtre (1, seq_len, n_feat) du jour ou None."""
+        L = self.seq_length
+        date = pd.Timestamp(new_row["date"])
+        metrics.inc("predict.latest_calls")
+        with metrics.timer("predict.transform"):
+            x_new = self._transform_record(dict(new_row))
+
+        with self._latest_lock:
+            # les features catégorielles (Genotype, déduit du profil) sont notées dans l’entrée : un
+            # changement de profil réamorce le cache au lieu de mêler lignes ancien / nouveau génotype
+            key = (scope, pid)
+            cats = tuple(new_row.get(c) for c in self.categorical_features)
+            entry = self._latest_cache.get(key)
+            if entry is None or entry[0] != cats or (len(entry[1]) and date < entry[1][-1]):
+                if history is None:
+                    raise KeyError(f"Pas de cache pour {pid} : fournir history pour l’amorcer.")
+                metrics.inc("predict.latest_cache_miss")
+                with metrics.timer("predict.latest_prime"):
+                    entry = (cats, *self._prime_latest(history() if callable(history) else history, date))
+            _, dates, X = entry
+            if len(dates) and dates[-1] == date:
+                dates, X = dates[:-1], X[:-1]
+            dates = np.append(dates, np.datetime64(date, "ns"))[-L:]
+            X = np.concatenate([X.reshape(-1, x_new.shape[1]), x_new])[-L:]
+            self._latest_cache[key] = (cats, dates, X)
+            self._latest_cache.move_to_end(key)
+            while len(self._latest_cache) > self.latest_cache_size:
+                self._latest_cache.popitem(last=False)
+
+        return self._make_sequences(X) if len(X) >= L else None
+
+    def _prime_latest(self, history: pd.DataFrame, before: pd.Timestamp) -> tuple[np.ndarray, np.ndarray]:
+        """Transforme les (seq_length-1) derniers jours de history antérieurs à `before`."""
+        hist = history[pd.to_datetime(history["date"]) < before].sort_values("date").tail(self.seq_length - 1)
+        hist = self._complete_columns(hist.copy())
+        X = self._transform(hist) if len(hist) else np.empty((0, 0))
+        return pd.to_datetime(hist["date"]).to_numpy(dtype="datetime64[ns]"), X
+
+    def invalidate_latest(self, pid: str | None = None, scope: Hashable = None) -> None:
+        """
+        Oublie le cache incrémental d’un patient (ou de tous) après une réécriture d’historique,
+        dans un seul scope s’il est fourni.
+        """
+        with self._latest_lock:
+            for key in [k for k in self._latest_cache
+                        if (pid is None or k[1] == pid) and (scope is None or k[0] == scope)]:
+                del self._latest_cache[key]
+
+# -------- Micro-batching : file d’inférence partagée par le process
+
+class _Pending:
+    __slots__ = ("model", "X", "future", "t_submit")
+
+    def __init__(self, model: CrisisRiskModel, X: np.ndarray):
+        self.model, self.X, self.future, self.t_submit = model, X, Future(), time.perf_counter()
+
+class InferenceDispatcher:
     """
-    pkl_path : chemin vers hybrid_crisis_predictor.pkl (artifacts)
-    keras_path : si le LSTM n’a pas pu être picklé, fournis le chemin '.keras' (optionnel)
+    Regroupe les fenêtres soumises en concurrence (sessions Streamlit = threads) :
+    dès la 1re requête, on attend au plus max_wait_ms ou jusqu’à max_batch fenêtres,
+    puis un seul _predict_windows par modèle score tout le lot. Chaque appelant
+    récupère ses probas via un Future. Thread de travail démarré à la 1re soumission.
     """
-    global _model_cache
-    if _model_cache is not None:
-        return _model_cache
 
+    def __init__(self, max_wait_ms: float = 2.0, max_batch: int = 256):
+        self.max_wait_ms = float(max_wait_ms)
+        self.max_batch = int(max_batch)
+        self._queue: queue.SimpleQueue[_Pending | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "requests": 0, "windows": 0, "max_batch_windows": 0}
+
+    def submit(self, model: CrisisRiskModel, X_seq: np.ndarray) -> Future:
+        """X_seq (k, seq_len, n_feat) -> Future de k probas (0..1)."""
+        item = _Pending(model, X_seq)
+        self._ensure_worker()
+        self._queue.put(item)
+        return item.future
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        s["mean_batch_requests"] = s["requests"] / s["batches"] if s["batches"] else 0.0
+        return s
+
+    def close(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="inference-dispatcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self, first: _Pending) -> tuple[list[_Pending], bool]:
+        batch, n_windows = [first], len(first.X)
+        deadline = time.perf_counter() + self.max_wait_ms / 1e3
+        while n_windows < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            n_windows += len(item.X)
+        return batch, False
+
+    def _loop(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+            now = time.perf_counter()
+            for it in batch:
+                metrics.observe("dispatch.queue_wait_ms", (now - it.t_submit) * 1e3)
+            groups: dict[int, list[_Pending]] = {}
+            for it in batch:
+                groups.setdefault(id(it.model), []).append(it)
+            for items in groups.values():
+                self._run(items)
+
+    def _run(self, items: list[_Pending]) -> None:
+        sizes = [len(it.X) for it in items]
+        metrics.observe("dispatch.batch_requests", len(items))
+        metrics.observe("dispatch.batch_windows", sum(sizes))
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(items)
+            self._stats["windows"] += sum(sizes)
+            self._stats["max_batch_windows"] = max(self._stats["max_batch_windows"], sum(sizes))
+        try:
+            with metrics.timer("dispatch.run"):
+                p = items[0].model._predict_windows(np.concatenate([it.X for it in items]))
+        except Exception as e:  # l’erreur est remontée à chaque appelant
+            for it in items:
+                it.future.set_exception(e)
+            return
+        for it, a, b in zip(items, np.cumsum([0] + sizes[:-1]), np.cumsum(sizes)):
+            it.future.set_result(p[a:b])
+
+# -------- Registre de modèles (cache LRU par artefact)
+
+class ModelRegistry:
+    """
+    Cache LRU des modèles chargés, clé = (artefact .pkl, mtime, taille, artefact .keras, alpha).
+    Un .pkl réécrit (ou un nouveau .pkl déposé dans le dossier models/) change la clé :
+    le modèle est rechargé au prochain appel, construit entièrement hors du cache puis publié
+    d’un bloc – les appelants en cours gardent l’ancienne instance. Pour un dépôt atomique,
+    écrire le fichier à côté puis le renommer (os.replace).
+    """
+
+    def __init__(self, max_size: int = 4, hash_content: bool = False):
+        self.max_size = int(max_size)
+        self.hash_content = hash_content  # sha256 du fichier en plus de mtime/taille
+        self._models: OrderedDict[tuple, CrisisRiskModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: dict[tuple, threading.Lock] = {}
+
+    @staticmethod
+    def resolve(pkl_path: str, lstm_backend: str = "auto") -> str:
+        """
+        Artefact effectivement chargé. Le format dossier (cf. export_artifacts) est préféré :
+        models/x.pkl -> models/x/ si ce dossier a été exporté depuis ce même .pkl (sha256 noté
+        dans le manifeste) ; un .pkl différent déposé ensuite reprend la main.
+        Un dossier parent (ex. models/) désigne son artefact le plus récent.
+        lstm_backend="keras" : le dossier ne contient que les poids NumPy, on garde le .pkl.
+        """
+        if os.path.isdir(pkl_path) and not _is_artifact_dir(pkl_path):
+            entries = [os.path.join(pkl_path, f) for f in os.listdir(pkl_path)]
+            cands = [p for p in entries if p.endswith(".pkl")
+                     or (_is_artifact_dir(p) and not os.path.exists(p + ".pkl"))]
+            if not cands:
+                raise FileNotFoundError(f"Aucun artefact (.pkl ou dossier) dans {pkl_path}")
+            pkl_path = max(cands, key=_artifact_mtime)
+        if pkl_path.endswith(".pkl") and lstm_backend != "keras":
+            exported = pkl_path[:-len(".pkl")]
+            if _is_artifact_dir(exported) and (not os.path.exists(pkl_path) or _exported_from(exported, pkl_path)):
+                return exported
+        return pkl_path
+
+    def _fingerprint(self, path: str | None) -> tuple:
+        if not path or not os.path.exists(path):
+            return (path,)
+        if _is_artifact_dir(path):
+            # le manifeste est écrit en dernier : sa date identifie la version du dossier
+            st = os.stat(os.path.join(path, MANIFEST))
+            return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        st = os.stat(path)
+        fp = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        if self.hash_content:
+            import hashlib
+            with open(path, "rb") as f:
+                fp += (hashlib.sha256(f.read()).hexdigest(),)
+        return fp
+
+    def key(self, pkl_path: str, keras_path: str | None = None, alpha: float = 0.6,
+            lstm_backend: str = "auto") -> tuple:
+        return (self._fingerprint(self.resolve(pkl_path, lstm_backend)), self._fingerprint(keras_path),
+                float(alpha), lstm_backend)
+
+    def get(self, pkl_path: str, keras_path: str | None = None, alpha: float = 0.6,
+            warmup: bool = False, lstm_backend: str = "auto") -> CrisisRiskModel:
+        key = self.key(pkl_path, keras_path, alpha, lstm_backend)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        # un seul chargement par clé, sans bloquer les lectures des autres modèles
+        with loading:
+            with self._lock:
+                model = self._models.get(key)
+            if model is None:
+                with metrics.timer("model.load"):
+                    model = _load_artifacts(key[0][0], keras_path, alpha, lstm_backend)
+                if warmup:
+                    with metrics.timer("model.warm_up"):
+                        model.warm_up()
+                with self._lock:
+                    # une nouvelle version d’un artefact remplace les anciennes
+                    for k in [k for k in self._models if k[0][0] == key[0][0] and k[2:] == key[2:]]:
+                        del self._models[k]
+                    self._models[key] = model
+                    while len(self._models) > self.max_size:
+                        self._models.popitem(last=False)
+                    self._loading.pop(key, None)
+        return model
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+def _load_artifacts(pkl_path: str, keras_path: str | None, alpha: float, lstm_backend: str = "auto") -> CrisisRiskModel:
+    if _is_artifact_dir(pkl_path):
+        return CrisisRiskModel(load_artifacts_dir(pkl_path), alpha=alpha, lstm_backend=lstm_backend)
     artifacts = joblib.load(pkl_path)
 
     # Si le LSTM n’est pas dans le pkl, on tente un chargement séparé
@@ -115,8 +733,138 @@ def load_model(pkl_path: str, keras_path: str | None = None, alpha: float = 0.6)
         import tensorflow as tf
         artifacts["lstm_model"] = tf.keras.models.load_model(keras_path)
 
-    _model_cache = CrisisRiskModel(artifacts, alpha=alpha)
-    return _model_cache
+    return CrisisRiskModel(artifacts, alpha=alpha, lstm_backend=lstm_backend)
+
+# -------- Format dossier : manifeste JSON + poids .npy (mmap) + booster XGBoost
+
+MANIFEST = "manifest.json"
+ARTIFACT_FORMAT = "bloowe-hybrid/1"
+
+def _is_artifact_dir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+def _artifact_mtime(path: str) -> float:
+    return os.path.getmtime(os.path.join(path, MANIFEST) if _is_artifact_dir(path) else path)
+
+def _file_sha256(path: str) -> str:
+    import hashlib
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+@functools.lru_cache(maxsize=64)
+def _exported_from_cached(art_dir: str, pkl_path: str, _dir_fp: tuple, _pkl_fp: tuple) -> bool:
+    with open(os.path.join(art_dir, MANIFEST)) as f:
+        source = json.load(f).get("source") or {}
+    return source.get("sha256") == _file_sha256(pkl_path)
+
+def _exported_from(art_dir: str, pkl_path: str) -> bool:
+    """Le dossier a-t-il été exporté depuis ce .pkl ? (mémoïsé tant que les fichiers ne changent pas)"""
+    d, p = os.stat(os.path.join(art_dir, MANIFEST)), os.stat(pkl_path)
+    return _exported_from_cached(art_dir, pkl_path, (d.st_mtime_ns, d.st_size), (p.st_mtime_ns, p.st_size))
+
+def export_artifacts(model: CrisisRiskModel, out_dir: str, source_pkl: str | None = None) -> str:
+    """
+    Écrit le modèle en dossier sans pickle :
+      manifest.json  seq_length, listes de features, plan du preprocessor compilé, couches LSTM
+      lstm_<i>_<j>.npy  poids float32 (chargés en mmap, pages partagées entre workers)
+      xgb.ubj         booster XGBoost (format binaire natif)
+    Le dossier est construit à côté puis mis en place par renommage (le manifeste en dernier).
+    source_pkl : .pkl d’origine ; son sha256 est noté pour que load_model préfère ce dossier.
+    """
+    if model._pre_compiled is None:
+        raise NotImplementedError("preprocessor non compilable : format dossier indisponible")
+    if model.lstm is not None and model._lstm_np is None:
+        model_np = NumpyLSTM.from_keras(model.lstm)  # NotImplementedError si couche non gérée
+    else:
+        model_np = model._lstm_np
+
+    out_dir = os.path.abspath(out_dir.rstrip("/"))
+    tmp = f"{out_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp, exist_ok=False)
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "seq_length": model.seq_length,
+        "feature_input_cols": model.feature_input_cols,
+        "numeric_features": model.numeric_features,
+        "categorical_features": model.categorical_features,
+        "preprocessor": model._pre_compiled.to_dict(),
+        "lstm": None,
+        "xgb": None,
+        "source": {"file": os.path.basename(source_pkl), "sha256": _file_sha256(source_pkl)} if source_pkl else None,
+    }
+    if model_np is not None:
+        layers = []
+        for i, layer in enumerate(model_np.layers):
+            files = []
+            for j, w in enumerate(layer["weights"]):
+                files.append(f"lstm_{i}_{j}.npy")
+                np.save(os.path.join(tmp, files[-1]), np.ascontiguousarray(w, dtype=np.float32))
+            layers.append({k: v for k, v in layer.items() if k != "weights"} | {"weights": files})
+        manifest["lstm"] = {"layers": layers}
+    if model.xgb is not None:
+        model.xgb.save_model(os.path.join(tmp, "xgb.ubj"))
+        manifest["xgb"] = {"file": "xgb.ubj", "class": type(model.xgb).__name__}
+    with open(os.path.join(tmp, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    old = None
+    if os.path.exists(out_dir):
+        old = f"{out_dir}.old-{os.getpid()}"
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+    return out_dir
+
+def load_artifacts_dir(path: str, mmap: bool = True) -> dict:
+    """Relit un dossier export_artifacts -> dict d’artefacts pour CrisisRiskModel (ni pickle ni TensorFlow)."""
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Format d’artefact inconnu : {manifest.get('format')}")
+    artifacts = {k: manifest[k] for k in ("seq_length", "feature_input_cols", "numeric_features", "categorical_features")}
+    artifacts["preprocessor"] = CompiledPreprocessor.from_dict(manifest["preprocessor"])
+    if manifest.get("lstm"):
+        layers = []
+        for layer in manifest["lstm"]["layers"]:
+            weights = [np.load(os.path.join(path, fn), mmap_mode="r" if mmap else None) for fn in layer["weights"]]
+            layers.append({**layer, "weights": weights})
+        artifacts["lstm_model"] = NumpyLSTM(layers)
+    if manifest.get("xgb"):
+        import xgboost
+        xgb = getattr(xgboost, manifest["xgb"].get("class", "XGBClassifier"))()
+        xgb.load_model(os.path.join(path, manifest["xgb"]["file"]))
+        artifacts["xgb_model"] = xgb
+    return artifacts
+
+# -------- API module-level avec cache (registre partagé par le process)
+_registry = ModelRegistry()
+_dispatcher: InferenceDispatcher | None = InferenceDispatcher(
+    max_wait_ms=float(os.environ.get("BLOOWE_BATCH_WAIT_MS", 2.0)),
+    max_batch=int(os.environ.get("BLOOWE_BATCH_MAX", 256)),
+)
+
+def configure_dispatcher(max_wait_ms: float = 2.0, max_batch: int = 256, enabled: bool = True) -> InferenceDispatcher | None:
+    """Politique de micro-batching du process (enabled=False : scoring direct, sans file)."""
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.close()
+    _dispatcher = InferenceDispatcher(max_wait_ms, max_batch) if enabled else None
+    return _dispatcher
+
+def dispatcher_stats() -> dict:
+    return _dispatcher.stats() if _dispatcher is not None else {}
+
+def load_model(pkl_path: str, keras_path: str | None = None, alpha: float = 0.6, warmup: bool = False,
+               lstm_backend: str = "auto") -> CrisisRiskModel:
+    """
+    pkl_path : chemin vers hybrid_crisis_predictor.pkl (artifacts), ou dossier models/ (dernier artefact) ;
+               le format dossier exporté à côté du .pkl est préféré (cf. ModelRegistry.resolve)
+    keras_path : si le LSTM n’a pas pu être picklé, fournis le chemin '.keras' (optionnel)
+    warmup : exécute une inférence factice au chargement (traçage TF payé hors requête)
+    lstm_backend : cf. CrisisRiskModel ("auto" = NumPy si possible, sans appel TensorFlow)
+    """
+    return _registry.get(pkl_path, keras_path=keras_path, alpha=alpha, warmup=warmup, lstm_backend=lstm_backend)
 
 def predict_patient_timeseries(df_patient: pd.DataFrame, pkl_path: str, keras_path: str | None = None, alpha: float = 0.6) -> pd.Series:
     """
@@ -126,3 +874,32 @@ def predict_patient_timeseries(df_patient: pd.DataFrame, pkl_path: str, keras_pa
     model = load_model(pkl_path, keras_path=keras_path, alpha=alpha)
     probs = model.predict_proba_series(df_patient.sort_values("date").reset_index(drop=True))
     return (probs * 100.0).round(0)
+
+def predict_patient_latest(pid: str, new_row: dict, history: pd.DataFrame | Callable[[], pd.DataFrame] | None,
+                           pkl_path: str, keras_path: str | None = None, alpha: float = 0.6,
+                           scope: Hashable = None) -> float:
+    """
+    Risque (0..100) du seul jour de new_row – cf. CrisisRiskModel.predict_latest (scope).
+    Coût constant quelle que soit la longueur de l’historique (hors amorçage du cache) ;
+    les saisies concurrentes partagent un lot via le dispatcher du process.
+    """
+    model = load_model(pkl_path, keras_path=keras_path, alpha=alpha)
+    return round(model.predict_latest(pid, new_row, history=history, dispatcher=_dispatcher, scope=scope) * 100.0, 0)
+
+def predict_cohort(frames: dict[str, pd.DataFrame], pkl_path: str, keras_path: str | None = None, alpha: float = 0.6) -> dict[str, pd.Series]:
+    """
+    frames : {pid: DataFrame patient}. Retourne {pid: Series 'risk' (0..100)} alignée
+    sur l’index de chaque DataFrame – cf. CrisisRiskModel.predict_proba_cohort.
+    """
+    model = load_model(pkl_path, keras_path=keras_path, alpha=alpha)
+    return {pid: (probs * 100.0).round(0) for pid, probs in model.predict_proba_cohort(frames).items()}
+
+if __name__ == "__main__":
+    # python model_service.py export models/hybrid_crisis_predictor.pkl [dossier_cible]
+    import sys
+    if len(sys.argv) >= 3 and sys.argv[1] == "export":
+        src = sys.argv[2]
+        dst = sys.argv[3] if len(sys.argv) > 3 else src[:-len(".pkl")] if src.endswith(".pkl") else src + ".d"
+        print(export_artifacts(_load_artifacts(src, None, 0.6), dst, source_pkl=src))
+    else:
+        print("usage : python model_service.py export <artefact.pkl> [dossier_cible]")
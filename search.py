@@ -0,0 +1,144 @@
+# search.py
+# Index plein texte en mémoire (ressources, messages) : tokenisation française sans accents, BM25
+#
+# Index inversé à postings compacts (array d’entiers par terme, doc ids croissants) : ajout
+# incrémental O(longueur du texte), requête vectorisée NumPy sur les seuls postings des termes
+# demandés, filtre optionnel par groupe (ex. patient) avant agrégation.
+
+from __future__ import annotations
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+
+import numpy as np
+
+_STOPWORDS = frozenset("""
+a ai au aux avec avez avons c ca ce ces cet cette d dans de des du elle elles en es est et etre eu eux
+il ils j je l la le les leur leurs lui m ma mais me mes moi mon n ne ni nos notre nous on ont ou par pas
+pour qu que qui s sa se ses si son sont sur t ta te tes toi ton tu un une vos votre vous y
+""".split())
+_TOKEN = re.compile(r"[a-z0-9]+")
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "Œ": "oe", "Æ": "ae", "’": "'"})
+
+def normalize(text: str) -> str:
+    """Minuscules sans accents ni ligatures (« Œdème » -> « oedeme »)."""
+    # NFKD sépare lettres et diacritiques ; seuls les caractères ASCII comptent pour les tokens
+    text = unicodedata.normalize("NFKD", text.translate(_LIGATURES))
+    return text.encode("ascii", "ignore").decode().lower()
+
+def _stem(token: str) -> str:
+    # racinisation minimale : pluriels en -s / -x (douleurs -> douleur, eaux -> eau)
+    return token[:-1] if len(token) > 3 and token[-1] in "sx" else token
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(t) for t in _TOKEN.findall(normalize(text or "")) if t not in _STOPWORDS]
+
+class SearchIndex:
+    """
+    Index inversé BM25 (k1, b) à ajout incrémental. fork() crée un niveau au-dessus de l’index
+    (qui n’est alors plus modifié) : les documents ajoutés restent propres au fork, les
+    statistiques BM25 (N, longueur moyenne, df) couvrent l’ensemble des niveaux.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self._postings: dict[str, tuple[array, array]] = {}  # terme -> (doc ids, tf)
+        self._lengths = array("H")
+        self._groups = array("i")
+        self._group_codes: dict = {}
+        self._payloads: list = []
+        self._total_len = 0
+        self._base: SearchIndex | None = None
+        self._lock = threading.Lock()
+
+    def fork(self) -> SearchIndex:
+        child = SearchIndex(self.k1, self.b)
+        child._base = self
+        return child
+
+    def _levels(self) -> list[SearchIndex]:
+        levels, idx = [], self
+        while idx is not None:
+            levels.append(idx)
+            idx = idx._base
+        return levels[::-1]
+
+    def __len__(self) -> int:
+        return sum(len(level._payloads) for level in self._levels())
+
+    def add(self, text: str, payload, group=None) -> None:
+        terms = tokenize(text)
+        with self._lock:
+            doc = len(self._payloads)
+            for term, tf in Counter(terms).items():
+                post = self._postings.get(term)
+                if post is None:
+                    post = self._postings[term] = (array("I"), array("H"))
+                post[0].append(doc)
+                post[1].append(min(tf, 0xFFFF))
+            self._lengths.append(min(len(terms), 0xFFFF))
+            self._total_len += len(terms)
+            self._groups.append(self._group_codes.setdefault(group, len(self._group_codes)))
+            self._payloads.append(payload)
+
+    def _score_level(self, weights: dict[str, float], avgdl: float, group) -> tuple[np.ndarray, np.ndarray]:
+        """(doc ids, scores) des documents du niveau contenant au moins un terme."""
+        empty = np.empty(0, dtype=np.uint32), np.empty(0)
+        code = self._group_codes.get(group) if group is not None else None
+        if not self._payloads or (group is not None and code is None):
+            return empty
+        ids_all, w_all = [], []
+        # les vues frombuffer bloquent l’agrandissement des array : elles ne survivent pas au verrou
+        with self._lock:
+            lengths = np.frombuffer(self._lengths, dtype=np.uint16)
+            groups = np.frombuffer(self._groups, dtype=np.int32)
+            ids = tf = None
+            for term, idf in weights.items():
+                post = self._postings.get(term)
+                if post is None:
+                    continue
+                ids = np.frombuffer(post[0], dtype=np.uint32)
+                tf = np.frombuffer(post[1], dtype=np.uint16)
+                if code is not None:
+                    keep = groups[ids] == code
+                    ids, tf = ids[keep], tf[keep]
+                tf = tf.astype(np.float64)
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[ids] / avgdl)
+                ids_all.append(ids.copy())
+                w_all.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+            del lengths, groups, ids, tf
+        if not ids_all:
+            return empty
+        ids, inv = np.unique(np.concatenate(ids_all), return_inverse=True)
+        return ids, np.bincount(inv, weights=np.concatenate(w_all))
+
+    def search(self, query: str, k: int = 10, group=None) -> list[tuple[object, float]]:
+        """k meilleurs documents (payload, score BM25), éventuellement restreints à un groupe."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        levels = self._levels()
+        n_docs = sum(len(level._payloads) for level in levels)
+        if not terms or not n_docs:
+            return []
+        avgdl = max(sum(level._total_len for level in levels) / n_docs, 1.0)
+        weights = {}
+        for term in terms:
+            df = sum(len(level._postings[term][0]) for level in levels if term in level._postings)
+            if df:
+                weights[term] = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        if not weights:
+            return []
+
+        best: list[tuple[float, int, int]] = []
+        for li, level in enumerate(levels):
+            ids, scores = level._score_level(weights, avgdl, group)
+            if len(ids) > k:
+                top = np.argpartition(-scores, k)[:k]
+                ids, scores = ids[top], scores[top]
+            best.extend((float(s), li, int(d)) for s, d in zip(scores, ids))
+        # à score égal, le document le plus récent (ajouté en dernier) d’abord
+        best = heapq.nlargest(k, best, key=lambda t: (t[0], t[1], t[2]))
+        return [(levels[li]._payloads[d], s) for s, li, d in best]
@@ -0,0 +1,342 @@
+# snapshot.py
+# Instantanés colonnaires Parquet / Arrow (IPC) du jeu de données : séries, messages, profils
+#
+#   python snapshot.py save .data/snap            # BLOOWE_DB (ou jeu factice) -> répertoire
+#   python snapshot.py info .data/snap
+#
+# Un instantané est un répertoire series / messages / patients / doctors / resources au même
+# format (.parquet, compressé, ou .arrow, non compressé et lisible sans copie via mmap).
+# Séries : colonnes aux dtypes compacts de data.SERIES_SCHEMA, patient_id et Genotype en
+# dictionnaire, groupes de lignes (row groups / record batches) alignés sur les patients — un
+# patient n’est jamais coupé — ce qui permet de ne lire que les groupes des patients demandés.
+# Profils, médecins et ressources gardent leur structure imbriquée (struct / list Arrow).
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import data
+from storage import MESSAGE_COLUMNS
+
+FORMATS = ("parquet", "arrow")
+ROWS_PER_GROUP = 65_536
+_DICT = pa.dictionary(pa.int32(), pa.string())
+# dictionnaires fixes (identiques dans tous les groupes) ; les autres (ids) sont propres à
+# chaque row group Parquet et stockés en chaînes simples en Arrow IPC, qui n’admet qu’un
+# dictionnaire par champ pour tout le fichier
+FIXED_DICTS = {"Genotype": data.GENOTYPES, "sender": ["doctor", "patient"]}
+
+SERIES_ARROW = pa.schema(
+    [("patient_id", _DICT), ("date", pa.timestamp("ns"))]
+    + [(c, pa.dictionary(pa.int8(), pa.string()) if isinstance(t, pd.CategoricalDtype) else pa.from_numpy_dtype(t))
+       for c, t in data.SERIES_SCHEMA.items()])
+MESSAGES_ARROW = pa.schema([
+    ("id", pa.string()), ("patient_id", _DICT), ("doctor_id", _DICT), ("sender", pa.dictionary(pa.int8(), pa.string())),
+    ("text", pa.string()),
+    ("timestamp", pa.timestamp("ns")), ("read_by_patient", pa.bool_()), ("read_by_doctor", pa.bool_()),
+])
+
+def _path(directory: str | Path, name: str, fmt: str) -> Path:
+    return Path(directory) / f"{name}.{fmt}"
+
+def _fmt(path: str | Path) -> str:
+    fmt = Path(path).suffix.lstrip(".")
+    if fmt not in FORMATS:
+        raise ValueError(f"extension inconnue : {path} (attendu : .parquet ou .arrow)")
+    return fmt
+
+# ----------------------- Écriture / lecture bas niveau ----------------------
+
+class _Writer:
+    """Écrit des tables successives : un row group Parquet / un record batch Arrow par table."""
+
+    def __init__(self, path: str | Path, schema: pa.Schema):
+        self.fmt = _fmt(path)
+        if self.fmt == "arrow":
+            schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_dictionary(f.type) and f.name not in FIXED_DICTS
+                                else f for f in schema])
+        self.schema = schema
+        if self.fmt == "parquet":
+            self._w = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(str(path), "wb")
+            self._w = pa.ipc.new_file(self._sink, schema)
+
+    def write(self, table: pa.Table) -> None:
+        table = table.cast(self.schema)
+        if self.fmt == "parquet":
+            self._w.write_table(table, row_group_size=max(len(table), 1))
+        else:
+            for batch in table.combine_chunks().to_batches(max_chunksize=max(len(table), 1)):
+                self._w.write_batch(batch)
+
+    def close(self) -> None:
+        self._w.close()
+        if self.fmt == "arrow":
+            self._sink.close()
+
+    def __enter__(self) -> _Writer:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class _Reader:
+    """Groupes (row groups / record batches) d’un fichier, lus à la demande avec projection de colonnes."""
+
+    def __init__(self, path: str | Path, memory_map: bool = True):
+        self.fmt = _fmt(path)
+        if self.fmt == "parquet":
+            self._f = pq.ParquetFile(path, memory_map=memory_map)
+            self.schema = self._f.schema_arrow
+            self.n_groups = self._f.num_row_groups
+        else:
+            source = pa.memory_map(str(path)) if memory_map else pa.OSFile(str(path))
+            self._f = pa.ipc.open_file(source)
+            self.schema = self._f.schema
+            self.n_groups = self._f.num_record_batches
+
+    def read(self, i: int, columns: list[str] | None = None) -> pa.Table:
+        if self.fmt == "parquet":
+            return self._f.read_row_group(i, columns=columns)
+        batch = self._f.get_batch(i)  # sans copie : tampons adossés au fichier mappé
+        return pa.Table.from_batches([batch if columns is None else batch.select(columns)])
+
+    def group_pids(self, i: int) -> set[str]:
+        """Patients présents dans le groupe (dictionnaire de patient_id, sans décoder les lignes)."""
+        col = self.read(i, ["patient_id"]).column(0).combine_chunks()
+        return set(col.dictionary.to_pylist() if pa.types.is_dictionary(col.type) else pc.unique(col).to_pylist())
+
+def _array(values, type_: pa.DataType, name: str = "") -> pa.Array:
+    """Colonne pandas / NumPy -> Arrow au type du schéma (NaN -> null, chaînes -> dictionnaire)."""
+    if name in FIXED_DICTS:
+        codes = pd.Categorical(values, categories=FIXED_DICTS[name]).codes
+        return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), pa.array(FIXED_DICTS[name])).cast(type_)
+    arr = pa.array(values, from_pandas=True)
+    if pa.types.is_dictionary(type_) and not pa.types.is_dictionary(arr.type):
+        arr = arr.dictionary_encode()
+    return arr.cast(type_)
+
+def _table(frame: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    n = len(frame)
+    return pa.Table.from_arrays(
+        [_array(frame[f.name].array, f.type, f.name) if f.name in frame else pa.nulls(n, f.type) for f in schema],
+        schema=schema)
+
+# ----------------------- Séries ---------------------------------------------
+
+def store_frames(store: data.SeriesStore, rows_per_group: int = ROWS_PER_GROUP) -> Iterator[pd.DataFrame]:
+    """Contenu d’un SeriesStore en DataFrames longs d’environ rows_per_group lignes, patients entiers."""
+    batch, n = [], 0
+    for pid in store:
+        frame = store.frame(pid)
+        batch.append(frame.assign(patient_id=pid))
+        n += len(frame)
+        if n >= rows_per_group:
+            yield pd.concat(batch, ignore_index=True)
+            batch, n = [], 0
+    if batch:
+        yield pd.concat(batch, ignore_index=True)
+
+def write_series(frames: data.SeriesStore | Iterable[pd.DataFrame], path: str | Path,
+                 rows_per_group: int = ROWS_PER_GROUP) -> int:
+    """
+    Séries en .parquet / .arrow : un groupe par DataFrame long (trié par patient puis date).
+    Un SeriesStore est découpé en groupes de patients entiers. Renvoie le nombre de lignes.
+    """
+    if isinstance(frames, data.SeriesStore):
+        frames = store_frames(frames, rows_per_group)
+    n = 0
+    with _Writer(path, SERIES_ARROW) as w:
+        for frame in frames:
+            w.write(_table(frame, SERIES_ARROW))
+            n += len(frame)
+    return n
+
+def read_series(path: str | Path, columns: list[str] | None = None, pids: Iterable[str] | None = None,
+                memory_map: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    Séries en DataFrames longs (un par groupe), consommables par data.SeriesStore. `columns`
+    restreint les mesures lues (patient_id et date toujours inclus) ; `pids` ne lit que les
+    groupes contenant ces patients.
+    """
+    reader = _Reader(path, memory_map)
+    cols = None if columns is None else ["patient_id", "date", *(c for c in columns if c not in ("patient_id", "date"))]
+    wanted = None if pids is None else set(pids)
+    for i in range(reader.n_groups):
+        if wanted is not None and not (reader.group_pids(i) & wanted):
+            continue
+        frame = reader.read(i, cols).to_pandas()
+        if wanted is not None:
+            frame = frame[frame["patient_id"].isin(wanted)].reset_index(drop=True)
+        yield frame
+
+# ----------------------- Messages et documents ------------------------------
+
+def write_messages(messages: data.MessageStore | pd.DataFrame | Iterable[pd.DataFrame], path: str | Path,
+                   rows_per_group: int = ROWS_PER_GROUP) -> int:
+    """Messages (store, DataFrame ou flux de DataFrames) en groupes d’environ rows_per_group lignes."""
+    if isinstance(messages, data.MessageStore):
+        it = iter(messages)
+        messages = (pd.DataFrame(chunk, columns=MESSAGE_COLUMNS)
+                    for chunk in iter(lambda: [m for _, m in zip(range(rows_per_group), it)], []))
+    elif isinstance(messages, pd.DataFrame):
+        messages = (messages.iloc[i:i + rows_per_group] for i in range(0, max(len(messages), 1), rows_per_group))
+    n = 0
+    with _Writer(path, MESSAGES_ARROW) as w:
+        for frame in messages:
+            w.write(_table(frame, MESSAGES_ARROW))
+            n += len(frame)
+    return n
+
+def read_messages(path: str | Path, columns: list[str] | None = None, pids: Iterable[str] | None = None,
+                  memory_map: bool = True) -> pd.DataFrame:
+    reader = _Reader(path, memory_map)
+    wanted = None if pids is None else set(pids)
+    cols = columns if columns is None or wanted is None or "patient_id" in columns else [*columns, "patient_id"]
+    tables = [reader.read(i, cols) for i in range(reader.n_groups)
+              if wanted is None or reader.group_pids(i) & wanted]
+    frame = (pa.concat_tables(tables) if tables else reader.schema.empty_table().select(cols or reader.schema.names)).to_pandas()
+    for c in ("patient_id", "doctor_id", "sender"):
+        if c in frame:
+            frame[c] = frame[c].astype(object)  # ids en chaînes (clés de dict côté MessageStore)
+    if wanted is not None:
+        frame = frame[frame["patient_id"].isin(wanted)].reset_index(drop=True)
+        if columns is not None and "patient_id" not in columns:
+            frame = frame.drop(columns="patient_id")
+    return frame
+
+def write_records(records: Iterable[dict], path: str | Path, chunk: int = 10_000) -> int:
+    """Documents (profils, médecins, ressources) en colonnes imbriquées ; schéma déduit du 1er lot."""
+    records = iter(records)
+    writer, n = None, 0
+    try:
+        while batch := [r for _, r in zip(range(chunk), records)]:
+            table = pa.Table.from_struct_array(pa.array(batch))
+            writer = writer or _Writer(path, table.schema)
+            writer.write(table)
+            n += len(batch)
+    finally:
+        if writer:
+            writer.close()
+    if writer is None:
+        _Writer(path, pa.schema([("id", pa.string())])).close()
+    return n
+
+def read_records(path: str | Path, columns: list[str] | None = None, memory_map: bool = True) -> list[dict]:
+    reader = _Reader(path, memory_map)
+    out = []
+    for i in range(reader.n_groups):
+        out += reader.read(i, columns).to_pylist()
+    return out
+
+# ----------------------- Instantané complet ---------------------------------
+
+def save_snapshot(db: dict, directory: str | Path, fmt: str = "parquet", rows_per_group: int = ROWS_PER_GROUP) -> Path:
+    """Écrit tout le db (séries, messages, profils, médecins, ressources) dans `directory`."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format inconnu : {fmt!r} (attendu : {', '.join(FORMATS)})")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    registry = db["registry"]
+    write_series(store_frames(db["series"], rows_per_group), _path(directory, "series", fmt))
+    write_messages(db["messages"], _path(directory, "messages", fmt), rows_per_group)
+    write_records(registry.patients.values(), _path(directory, "patients", fmt))
+    write_records(registry.doctors.values(), _path(directory, "doctors", fmt))
+    write_records(db["resources"], _path(directory, "resources", fmt))
+    return directory
+
+def write_cohort(chunks: Iterable[dict], directory: str | Path, fmt: str = "parquet") -> int:
+    """
+    Instantané écrit en flux depuis des lots {patients, series, messages[, doctors, resources]}
+    (cohort.iter_cohort) : un groupe de séries par lot. Renvoie le nombre de lignes de séries.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    doctors, resources, n_rows = [], [], 0
+    with _Writer(_path(directory, "series", fmt), SERIES_ARROW) as series, \
+            _Writer(_path(directory, "messages", fmt), MESSAGES_ARROW) as messages:
+        patients = None
+        try:
+            for chunk in chunks:
+                series.write(_table(chunk["series"], SERIES_ARROW))
+                messages.write(_table(chunk["messages"], MESSAGES_ARROW))
+                table = pa.Table.from_struct_array(pa.array(chunk["patients"]))
+                patients = patients or _Writer(_path(directory, "patients", fmt), table.schema)
+                patients.write(table)
+                doctors += chunk.get("doctors", [])
+                resources += chunk.get("resources", [])
+                n_rows += len(chunk["series"])
+        finally:
+            if patients:
+                patients.close()
+    write_records(doctors, _path(directory, "doctors", fmt))
+    write_records(resources, _path(directory, "resources", fmt))
+    return n_rows
+
+def _snapshot_format(directory: Path) -> str:
+    for fmt in FORMATS:
+        if _path(directory, "series", fmt).exists():
+            return fmt
+    raise FileNotFoundError(f"aucun instantané dans {directory}")
+
+def load_raw(directory: str | Path, columns: list[str] | None = None, pids: Iterable[str] | None = None,
+             memory_map: bool = True) -> dict:
+    """Contenu brut de l’instantané (même forme que Backend.load_all) ; séries en flux de lots."""
+    directory = Path(directory)
+    fmt = _snapshot_format(directory)
+    wanted = None if pids is None else set(pids)
+    patients = read_records(_path(directory, "patients", fmt), memory_map=memory_map)
+    if wanted is not None:
+        patients = [p for p in patients if p["id"] in wanted]
+    resources = read_records(_path(directory, "resources", fmt), memory_map=memory_map)
+    for r in resources:
+        r["date"] = pd.Timestamp(r["date"])
+    return {
+        "patients": patients,
+        "doctors": read_records(_path(directory, "doctors", fmt), memory_map=memory_map),
+        "resources": resources,
+        "series": read_series(_path(directory, "series", fmt), columns, wanted, memory_map),
+        "messages": read_messages(_path(directory, "messages", fmt), pids=wanted, memory_map=memory_map),
+    }
+
+def load_snapshot(directory: str | Path, columns: list[str] | None = None, pids: Iterable[str] | None = None,
+                  memory_map: bool = True, backend=None) -> dict:
+    """db reconstruit depuis un instantané (option : sous-ensemble de colonnes et / ou de patients)."""
+    return data._build_db(load_raw(directory, columns, pids, memory_map), backend)
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Instantanés Parquet / Arrow du jeu de données")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    save = sub.add_parser("save", help="écrit l’instantané du jeu courant (BLOOWE_DB ou factice)")
+    save.add_argument("directory")
+    save.add_argument("--format", choices=FORMATS, default="parquet")
+    info = sub.add_parser("info", help="résume un instantané")
+    info.add_argument("directory")
+    args = ap.parse_args()
+
+    if args.cmd == "save":
+        import storage
+        t0 = time.perf_counter()
+        save_snapshot(data.open_db(storage.open_backend()), args.directory, args.format)
+        print(f"-> {args.directory} en {time.perf_counter() - t0:.1f} s")
+        return 0
+    directory = Path(args.directory)
+    fmt = _snapshot_format(directory)
+    for name in ("series", "messages", "patients", "doctors", "resources"):
+        path = _path(directory, name, fmt)
+        reader = _Reader(path)
+        rows = sum(reader.read(i, reader.schema.names[:1]).num_rows for i in range(reader.n_groups))
+        print(f"{path.name:<18} {rows:>10} lignes  {reader.n_groups:>6} groupes  {path.stat().st_size / 2**20:8.1f} Mo")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
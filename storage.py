@@ -0,0 +1,286 @@
+# storage.py
+# Backends de persistance derrière les accesseurs de data.py : mémoire (démo) ou SQLite (fichier local)
+#
+# Un backend charge le jeu complet au démarrage d’une session (load_all) et reçoit ensuite
+# les écritures au fil de l’eau (write-through) ; les lectures se font sur les index mémoire
+# de data.py. Sélection : variable d’environnement BLOOWE_DB=chemin/vers/bloowe.db.
+
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Colonnes persistées des séries quotidiennes (hors patient_id / date)
+SERIES_COLUMNS = [
+    ("risque", "REAL"), ("hemoglobine_g_dl", "REAL"), ("hematocrite_l_l", "REAL"),
+    ("hydratation_verres", "INTEGER"), ("kcal_total", "REAL"), ("kcal_sport", "REAL"),
+    ("sommeil_minutes", "REAL"), ("sommeil_qualite", "INTEGER"), ("stress_niveau", "INTEGER"),
+    ("douleur_niveau", "INTEGER"), ("Genotype", "TEXT"),
+]
+MESSAGE_COLUMNS = ["id", "patient_id", "doctor_id", "sender", "text", "timestamp", "read_by_patient", "read_by_doctor"]
+
+def new_id(prefix: str) -> str:
+    """
+    Identifiant unique sans compteur partagé : les sessions forkées d’une même base (et plusieurs
+    process sur un même fichier SQLite) ne peuvent plus créer deux fois le même id.
+    """
+    return f"{prefix}{uuid.uuid4().hex[:12].upper()}"
+
+class MemoryBackend:
+    """Aucune persistance : le jeu factice est régénéré à chaque session (comportement de démo)."""
+
+    name = "memory"
+
+    def is_empty(self) -> bool:
+        return True
+
+    def save_all(self, db: dict) -> None:
+        pass
+
+    def load_all(self) -> dict:
+        raise LookupError("le backend mémoire ne conserve aucune donnée")
+
+    def upsert_series_row(self, pid: str, row: dict) -> None:
+        pass
+
+    def add_message(self, msg: dict) -> None:
+        pass
+
+    def mark_read_by_patient(self, pid: str, did: str) -> None:
+        pass
+
+    def save_patient(self, patient: dict) -> None:
+        pass
+
+    def add_doctor(self, doctor: dict) -> None:
+        pass
+
+    def save_doctor(self, doctor: dict) -> None:
+        pass
+
+    def save_resource(self, resource: dict) -> None:
+        pass
+
+# ----------------------- SQLite ---------------------------------------------
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS patients (id TEXT PRIMARY KEY, email TEXT, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS doctors (id TEXT PRIMARY KEY, email TEXT, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS resources (id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS series (
+    patient_id TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    {", ".join(f'"{c}" {t}' for c, t in SERIES_COLUMNS)},
+    PRIMARY KEY (patient_id, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY, patient_id TEXT NOT NULL, doctor_id TEXT NOT NULL, sender TEXT NOT NULL,
+    text TEXT, timestamp INTEGER NOT NULL, read_by_patient INTEGER NOT NULL, read_by_doctor INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conv ON messages (patient_id, doctor_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_patients_email ON patients (email);
+CREATE INDEX IF NOT EXISTS idx_doctors_email ON doctors (email);
+"""
+
+_SERIES_COLS = ["patient_id", "date"] + [c for c, _ in SERIES_COLUMNS]
+_SERIES_SELECT = ", ".join(f'"{c}"' for c in _SERIES_COLS)
+_UPSERT_SERIES = (
+    f"INSERT INTO series ({_SERIES_SELECT}) VALUES ({', '.join('?' * len(_SERIES_COLS))}) ON CONFLICT (patient_id, date) "
+    "DO UPDATE SET " + ", ".join(f'"{c}"=excluded."{c}"' for c, _ in SERIES_COLUMNS)
+)
+# INSERT simple : un id déjà présent lève sqlite3.IntegrityError au lieu d’écraser le message
+_INSERT_MESSAGE = f"INSERT INTO messages ({', '.join(MESSAGE_COLUMNS)}) VALUES ({', '.join('?' * len(MESSAGE_COLUMNS))})"
+
+def _ns(ts) -> int:
+    """Horodatage -> entier (ns depuis l’epoch) : tri et index exacts, conversion vectorisable."""
+    return int(pd.Timestamp(ts).value)
+
+def _plain(v):
+    """Scalaire NumPy -> type Python natif (sqlite3 ne sait pas adapter np.int64)."""
+    return v.item() if isinstance(v, np.generic) else v
+
+def _resource_doc(r: dict) -> str:
+    return json.dumps({**r, "date": pd.Timestamp(r["date"]).isoformat()}, ensure_ascii=False)
+
+class SQLiteBackend:
+    """
+    Fichier SQLite local en mode WAL. Requêtes paramétrées à texte constant (mises en cache
+    par sqlite3), chargements en executemany dans une seule transaction, index patient/date
+    (clé primaire des séries) et patient/médecin/horodatage (messages).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # connexion partagée entre les threads de rendu Streamlit, écritures sérialisées par verrou
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+        self._lock = threading.Lock()
+        self._saved_docs: dict[tuple[str, str], str] = {}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self) -> bool:
+        return self._conn.execute("SELECT NOT EXISTS (SELECT 1 FROM patients)").fetchone()[0] == 1
+
+    # --- Écriture en masse ---------------------------------------------------
+
+    def save_all(self, db: dict) -> None:
+        """Remplace tout le contenu par `db` (une transaction, executemany par table)."""
+        registry = db["registry"]
+        patients = list(registry.patients.values())
+        with self._lock, self._conn:
+            for table in ("patients", "doctors", "resources", "series", "messages"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany("INSERT INTO patients VALUES (?, ?, ?)",
+                                   [(p["id"], p["email"].lower(), json.dumps(p, ensure_ascii=False)) for p in patients])
+            self._conn.executemany("INSERT INTO doctors VALUES (?, ?, ?)",
+                                   [(d["id"], d["email"].lower(), json.dumps(d, ensure_ascii=False)) for d in registry.doctors.values()])
+            self._conn.executemany("INSERT INTO resources VALUES (?, ?)",
+                                   [(r["id"], _resource_doc(r)) for r in db["resources"]])
+            for p in patients:
+                self._conn.executemany(_UPSERT_SERIES, self._series_rows(p["id"], db["series"][p["id"]]))
+            self._conn.executemany(_INSERT_MESSAGE, (self._message_row(m) for m in db["messages"]))
+        self._saved_docs.clear()
+
+    def bulk_load(self, chunks) -> int:
+        """
+        Remplace le contenu par un flux de lots {patients, doctors, resources, series, messages}
+        (séries et messages en DataFrames longs) ; un commit par lot, mémoire bornée à un lot.
+        Renvoie le nombre de lignes de séries écrites.
+        """
+        with self._lock, self._conn:
+            for table in ("patients", "doctors", "resources", "series", "messages"):
+                self._conn.execute(f"DELETE FROM {table}")
+        n_rows = 0
+        for chunk in chunks:
+            with self._lock, self._conn:
+                self._conn.executemany("INSERT INTO doctors VALUES (?, ?, ?)",
+                                       [(d["id"], d["email"].lower(), json.dumps(d, ensure_ascii=False)) for d in chunk.get("doctors", [])])
+                self._conn.executemany("INSERT INTO resources VALUES (?, ?)",
+                                       [(r["id"], _resource_doc(r)) for r in chunk.get("resources", [])])
+                self._conn.executemany("INSERT INTO patients VALUES (?, ?, ?)",
+                                       [(p["id"], p["email"].lower(), json.dumps(p, ensure_ascii=False)) for p in chunk["patients"]])
+                series = chunk["series"]
+                self._conn.executemany(_UPSERT_SERIES, self._series_rows(series["patient_id"].to_numpy(), series))
+                msgs = chunk["messages"]
+                self._conn.executemany(_INSERT_MESSAGE, zip(
+                    *(msgs[c].tolist() for c in MESSAGE_COLUMNS[:5]),
+                    msgs["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64).tolist(),
+                    msgs["read_by_patient"].astype(int).tolist(), msgs["read_by_doctor"].astype(int).tolist()))
+            n_rows += len(series)
+        self._saved_docs.clear()
+        return n_rows
+
+    @staticmethod
+    def _series_rows(pid: str | np.ndarray, df: pd.DataFrame):
+        n = len(df)
+        cols = [[pid] * n if isinstance(pid, str) else pid.tolist(), df["date"].to_numpy(dtype="datetime64[ns]").astype(np.int64).tolist()]
+        for c, _ in SERIES_COLUMNS:
+            if c in df:
+                values = df[c].to_numpy()
+                cols.append(values.tolist() if values.dtype != object else [_plain(v) for v in values])
+            else:
+                cols.append([None] * n)
+        return zip(*cols)
+
+    @staticmethod
+    def _message_row(m: dict) -> tuple:
+        return (m["id"], m["patient_id"], m["doctor_id"], m["sender"], m["text"], _ns(m["timestamp"]),
+                int(bool(m.get("read_by_patient"))), int(bool(m.get("read_by_doctor"))))
+
+    # --- Chargement ----------------------------------------------------------
+
+    def load_all(self) -> dict:
+        """Jeu complet : listes de dicts (patients, médecins, ressources), messages en DataFrame, séries en flux de lots."""
+        conn = self._conn
+        patients = [json.loads(doc) for (doc,) in conn.execute("SELECT doc FROM patients ORDER BY rowid")]
+        doctors = [json.loads(doc) for (doc,) in conn.execute("SELECT doc FROM doctors ORDER BY rowid")]
+        resources = []
+        for (doc,) in conn.execute("SELECT doc FROM resources ORDER BY rowid"):
+            r = json.loads(doc)
+            r["date"] = pd.Timestamp(r["date"])
+            resources.append(r)
+
+        # Séries : flux de lots longs (triés patient, date), consommé par SeriesStore sans tout matérialiser
+        series = self.iter_series()
+
+        msgs = pd.read_sql_query(
+            f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages ORDER BY patient_id, doctor_id, timestamp", conn)
+        msgs["timestamp"] = pd.to_datetime(msgs["timestamp"].to_numpy(dtype=np.int64), unit="ns")
+        msgs["read_by_patient"] = msgs["read_by_patient"].astype(bool)
+        msgs["read_by_doctor"] = msgs["read_by_doctor"].astype(bool)
+        return {"patients": patients, "doctors": doctors, "resources": resources, "series": series, "messages": msgs}
+
+    def iter_series(self, batch_patients: int = 1_000):
+        """Séries en DataFrames longs par tranches de patients (plages sur la clé primaire patient/date)."""
+        pids = [pid for (pid,) in self._conn.execute("SELECT id FROM patients ORDER BY id")]
+        for i in range(0, len(pids), batch_patients):
+            lo, hi = pids[i], pids[min(i + batch_patients, len(pids)) - 1]
+            frame = pd.read_sql_query(f"SELECT {_SERIES_SELECT} FROM series WHERE patient_id BETWEEN ? AND ? "
+                                      "ORDER BY patient_id, date", self._conn, params=(lo, hi))
+            frame["date"] = pd.to_datetime(frame["date"].to_numpy(dtype=np.int64), unit="ns")
+            yield frame
+
+    # --- Écritures unitaires (write-through) ----------------------------------
+
+    def upsert_series_row(self, pid: str, row: dict) -> None:
+        values = (pid, _ns(row["date"]), *(_plain(row.get(c)) for c, _ in SERIES_COLUMNS))
+        with self._lock, self._conn:
+            self._conn.execute(_UPSERT_SERIES, values)
+
+    def add_message(self, msg: dict) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(_INSERT_MESSAGE, self._message_row(msg))
+
+    def mark_read_by_patient(self, pid: str, did: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE messages SET read_by_patient=1 "
+                               "WHERE patient_id=? AND doctor_id=? AND read_by_patient=0", (pid, did))
+
+    def _save_doc(self, table: str, entity: dict) -> None:
+        doc = json.dumps(entity, ensure_ascii=False)
+        if self._saved_docs.get((table, entity["id"])) == doc:
+            return  # inchangé depuis la dernière écriture (reruns Streamlit)
+        with self._lock, self._conn:
+            self._conn.execute(f"INSERT INTO {table} (id, email, doc) VALUES (?, ?, ?) "
+                               "ON CONFLICT (id) DO UPDATE SET email=excluded.email, doc=excluded.doc",
+                               (entity["id"], entity["email"].lower(), doc))
+        self._saved_docs[(table, entity["id"])] = doc
+
+    def save_patient(self, patient: dict) -> None:
+        self._save_doc("patients", patient)
+
+    def add_doctor(self, doctor: dict) -> None:
+        """Nouveau médecin : INSERT simple, un id existant lève sqlite3.IntegrityError."""
+        doc = json.dumps(doctor, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO doctors (id, email, doc) VALUES (?, ?, ?)",
+                               (doctor["id"], doctor["email"].lower(), doc))
+        self._saved_docs[("doctors", doctor["id"])] = doc
+
+    def save_doctor(self, doctor: dict) -> None:
+        self._save_doc("doctors", doctor)
+
+    def save_resource(self, resource: dict) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO resources (id, doc) VALUES (?, ?) "
+                               "ON CONFLICT (id) DO UPDATE SET doc=excluded.doc",
+                               (resource["id"], _resource_doc(resource)))
+
+def open_backend(path: str | os.PathLike | None = None):
+    """SQLite si un chemin est fourni (ou BLOOWE_DB défini), sinon backend mémoire."""
+    path = path or os.environ.get("BLOOWE_DB")
+    return SQLiteBackend(path) if path else MemoryBackend()
@@ -0,0 +1,95 @@
+# tests/test_model_parity.py
+# Équivalences du chemin d’inférence optimisé avec l’implémentation de référence :
+# LSTM NumPy vs Keras, preprocessor compilé vs ColumnTransformer sklearn,
+# scoring incrémental (predict_latest) vs recalcul de toute la série.
+#
+#   python -m pytest -q tests
+
+from __future__ import annotations
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data  # noqa: E402
+from model_service import CompiledPreprocessor, NumpyLSTM, load_model  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not data.PKL_PATH.exists(), reason="artefact du modèle absent")
+
+@pytest.fixture(scope="module")
+def keras_model():
+    """Modèle du .pkl d’origine : LSTM Keras et preprocessor sklearn (références)."""
+    pytest.importorskip("tensorflow")
+    model = load_model(str(data.PKL_PATH), lstm_backend="keras")
+    assert model.lstm_backend == "keras" and not isinstance(model.lstm, NumpyLSTM)
+    return model
+
+@pytest.fixture(scope="module")
+def model():
+    """Modèle tel que l’app le charge (backend NumPy, preprocessor compilé)."""
+    return load_model(str(data.PKL_PATH))
+
+def _features(model, n: int, seed: int = 0, missing: float = 0.0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"date": pd.date_range(end=pd.Timestamp.today().normalize(), periods=n, freq="D"),
+                       "Genotype": rng.choice(["SS", "SC", "AS"], size=n)})
+    for c in model.numeric_features:
+        v = rng.normal(size=n) * 10
+        v[rng.random(n) < missing] = np.nan
+        df[c] = v
+    return df
+
+@pytest.mark.parametrize("batch", [1, 64, 1024])
+def test_numpy_lstm_matches_keras(keras_model, batch):
+    np_lstm = NumpyLSTM.from_keras(keras_model.lstm)
+    X = np.random.default_rng(batch).normal(size=(batch, keras_model.seq_length,
+                                                  keras_model.lstm.input_shape[-1])).astype(np.float32)
+    ref = keras_model.lstm.predict(X, verbose=0).reshape(-1)
+    np.testing.assert_allclose(np_lstm.predict(X).reshape(-1), ref, atol=1e-5)
+
+def test_compiled_preprocessor_matches_sklearn(keras_model):
+    compiled = CompiledPreprocessor.compile(keras_model.pre)
+    df = _features(keras_model, 365, missing=0.1)
+    df.loc[::7, "Genotype"] = np.nan    # imputation catégorielle
+    df.loc[3::11, "Genotype"] = "XX"    # modalité inconnue
+    ref = keras_model.pre.transform(df[keras_model.feature_input_cols]).astype(np.float32)
+    np.testing.assert_array_equal(compiled.transform(df), ref)
+    rec = df.iloc[5][keras_model.feature_input_cols].to_dict()
+    np.testing.assert_array_equal(compiled.transform_record(rec), ref[5:6])
+
+def test_compiled_preprocessor_roundtrip(keras_model):
+    compiled = CompiledPreprocessor.compile(keras_model.pre)
+    df = _features(keras_model, 30, seed=1)
+    np.testing.assert_array_equal(CompiledPreprocessor.from_dict(compiled.to_dict()).transform(df),
+                                  compiled.transform(df))
+
+def test_numpy_backend_series_matches_keras(keras_model, model):
+    df = _features(keras_model, 120, seed=2)
+    ref = keras_model.predict_proba_series(df.copy())
+    np.testing.assert_allclose(model.predict_proba_series(df.copy()).to_numpy(), ref.to_numpy(), atol=1e-5)
+
+def test_predict_latest_matches_full_series(model):
+    df = _features(model, 60, seed=3)
+    scope = object()  # cache incrémental propre au test
+    for i in range(len(df) - 5, len(df)):
+        full = float(model.predict_proba_series(df.iloc[:i+1].copy()).iloc[-1])
+        latest = model.predict_latest("P_TEST", df.iloc[i].to_dict(), history=df.iloc[:i], scope=scope)
+        assert latest == pytest.approx(full, abs=1e-6)
+    # ré-saisie du jour : la ligne remplace la dernière du cache
+    edited = df.iloc[-1].to_dict() | {model.numeric_features[0]: 0.0}
+    full = float(model.predict_proba_series(pd.concat([df.iloc[:-1], pd.DataFrame([edited])],
+                                                      ignore_index=True)).iloc[-1])
+    assert model.predict_latest("P_TEST", edited, scope=scope) == pytest.approx(full, abs=1e-6)
+
+def test_predict_latest_after_genotype_change(model):
+    # génotype du profil (constant sur l’historique, comme data.add_daily_entry) : SS -> AS -> SS
+    df = _features(model, 60, seed=4).assign(Genotype="SS")
+    scope = object()
+    for i, geno in zip(range(len(df) - 3, len(df)), ("SS", "AS", "SS")):
+        hist = df.iloc[:i+1].assign(Genotype=geno)
+        full = float(model.predict_proba_series(hist.copy()).iloc[-1])
+        latest = model.predict_latest("P_TEST", hist.iloc[-1].to_dict(), history=hist.iloc[:-1], scope=scope)
+        assert latest == pytest.approx(full, abs=1e-6)
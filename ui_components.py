@@ -1,7 +1,10 @@
 # ui_components.py
 # Composants UI réutilisables (cartes, badges, graphes, messages)
 
+import json
+
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 from typing import Optional
@@ -39,10 +42,102 @@ def conversation_row(doc: dict, last_text: str, unread: int):
     cols[2].markdown(badge(f"{unread} non lus", "warn") if unread else badge("0", "muted"), unsafe_allow_html=True)
 
 # ----------------------- Graphiques -----------------------------------------
+# Les séries longues (plusieurs années) ne sont pas envoyées telles quelles au navigateur :
+# courbes réduites par LTTB (Largest-Triangle-Three-Buckets, garde la forme et les pics),
+# histogrammes agrégés par tranches de jours (moyenne), seules les colonnes tracées sont gardées.
+# chart_panel trace plusieurs graphes en un seul spec (vconcat) sur un jeu de données partagé,
+# transmis une seule fois au lieu d’une copie par graphe.
+
+MAX_POINTS = 400     # points par courbe
+MAX_BARS = 120       # barres par histogramme
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices des n points retenus par LTTB (x croissant, sans NaN)."""
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = x.astype(np.float64); y = y.astype(np.float64)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)   # n-2 seaux entre le 1er et le dernier point
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else size
+        cx, cy = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+def line_rows(df: pd.DataFrame, columns: list[str], n: int = MAX_POINTS) -> pd.DataFrame:
+    """Lignes (date + columns) réunion des points LTTB de chaque colonne."""
+    df = df[["date", *columns]]
+    if len(df) <= n:
+        return df.reset_index(drop=True)
+    x = df["date"].to_numpy("datetime64[ns]").astype(np.int64)
+    keep = np.zeros(len(df), dtype=bool)
+    for c in columns:
+        y = df[c].to_numpy(np.float64, na_value=np.nan)
+        ok = np.flatnonzero(~np.isnan(y))
+        keep[ok[lttb(x[ok], y[ok], n)]] = True
+    return df[keep].reset_index(drop=True)
+
+def bar_rows(df: pd.DataFrame, columns: list[str], n: int = MAX_BARS) -> pd.DataFrame:
+    """Moyennes de columns par tranches de jours (une ligne par jour si la période est courte)."""
+    df = df[["date", *columns]]
+    if len(df) <= n:
+        return df.reset_index(drop=True)
+    span = (df["date"].iloc[-1] - df["date"].iloc[0]).days + 1
+    days = -(-span // n)
+    out = df.resample(f"{days}D", on="date").mean().dropna(how="all").reset_index()
+    return out.astype({c: "float32" for c in columns})
+
+def _plotted(columns) -> list[tuple[str, str]]:
+    return [(columns, columns)] if isinstance(columns, str) else list(columns)
+
+def chart_data(df: pd.DataFrame, charts: list[tuple[str, object, str]]) -> pd.DataFrame:
+    """Jeu de données partagé par les graphes : lignes « line » (LTTB) et « bar » (agrégées), colonne vue."""
+    lines = list(dict.fromkeys(c for kind, cols, _ in charts if kind == "line" for c, _ in _plotted(cols)))
+    bars = list(dict.fromkeys(c for kind, cols, _ in charts if kind == "bar" for c, _ in _plotted(cols)))
+    parts = [rows(df, cols).assign(vue=kind) for kind, rows, cols in
+             (("line", line_rows, lines), ("bar", bar_rows, bars)) if cols]
+    return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+def _chart(kind: str, columns, title: str, height: int = 220) -> alt.Chart:
+    """Graphe sans données propres (hérite du jeu partagé), filtré sur sa vue."""
+    plotted = _plotted(columns)
+    ch = alt.Chart().transform_filter(alt.datum.vue == kind)
+    mark = ch.mark_line() if kind == "line" else ch.mark_bar()
+    if len(plotted) == 1:
+        y = plotted[0][0]
+        return mark.encode(
+            x=alt.X("date:T", title="Date"),
+            y=alt.Y(f"{y}:Q", title=None),
+            tooltip=["date:T", alt.Tooltip(f"{y}:Q", format=".2f")]
+        ).transform_filter(f"isValid(datum['{y}'])").properties(height=height, title=title)
+    labels = json.dumps({c: label for c, label in plotted}, ensure_ascii=False)
+    return mark.transform_fold([c for c, _ in plotted], as_=["mesure", "valeur"]).transform_filter(
+        "isValid(datum.valeur)"
+    ).transform_calculate(mesure=f"{labels}[datum.mesure]").encode(
+        x=alt.X("date:T"),
+        y=alt.Y("valeur:Q"),
+        color=alt.Color("mesure:N", legend=alt.Legend(title=None)),
+        tooltip=["date:T", "mesure:N", alt.Tooltip("valeur:Q", format=".2f")]
+    ).properties(height=height + 40, title=title)
+
+def chart_panel(df: pd.DataFrame, charts: list[tuple[str, object, str]]):
+    """Plusieurs graphes empilés sur un même jeu de données.
+
+    charts : (« line » | « bar », colonne ou [(colonne, libellé), …], titre).
+    """
+    if df.empty or not charts: return
+    panel = alt.vconcat(*(_chart(kind, cols, title) for kind, cols, title in charts), data=chart_data(df, charts))
+    st.altair_chart(panel.resolve_scale(color="independent"), use_container_width=True)
 
 def sparkline(df: pd.DataFrame, y: str, title: str = ""):
     if df.empty: return
-    ch = alt.Chart(df).mark_line().encode(
+    ch = alt.Chart(line_rows(df, [y])).mark_line().encode(
         x=alt.X("date:T", axis=None), y=alt.Y(f"{y}:Q", axis=None)
     ).properties(height=60)
     st.altair_chart(ch, use_container_width=True)
@@ -51,34 +146,18 @@ def sparkline(df: pd.DataFrame, y: str, title: str = ""):
 
 def chart_line(df: pd.DataFrame, y: str, title: str):
     if df.empty: return
-    ch = alt.Chart(df).mark_line().encode(
-        x=alt.X("date:T", title="Date"),
-        y=alt.Y(f"{y}:Q", title=None),
-        tooltip=["date:T", alt.Tooltip(f"{y}:Q", format=".2f")]
-    ).properties(height=220, title=title)
-    st.altair_chart(ch, use_container_width=True)
+    st.altair_chart(_chart("line", y, title).properties(data=chart_data(df, [("line", y, title)])),
+                    use_container_width=True)
 
 def chart_bar(df: pd.DataFrame, y: str, title: str):
     if df.empty: return
-    ch = alt.Chart(df).mark_bar().encode(
-        x=alt.X("date:T", title="Date"),
-        y=alt.Y(f"{y}:Q", title=None),
-        tooltip=["date:T", alt.Tooltip(f"{y}:Q", format=".2f")]
-    ).properties(height=220, title=title)
-    st.altair_chart(ch, use_container_width=True)
+    st.altair_chart(_chart("bar", y, title).properties(data=chart_data(df, [("bar", y, title)])),
+                    use_container_width=True)
 
 def chart_multi_line(df: pd.DataFrame, y_columns: list[tuple[str, str]], title: str):
     if df.empty: return
-    melt = df.melt(id_vars=["date"], value_vars=[c for c, _ in y_columns], var_name="mesure", value_name="valeur")
-    mapping = {c: label for c, label in y_columns}
-    melt["mesure"] = melt["mesure"].map(mapping)
-    ch = alt.Chart(melt).mark_line().encode(
-        x=alt.X("date:T"),
-        y=alt.Y("valeur:Q"),
-        color=alt.Color("mesure:N", legend=alt.Legend(title=None)),
-        tooltip=["date:T", "mesure:N", alt.Tooltip("valeur:Q", format=".2f")]
-    ).properties(height=260, title=title)
-    st.altair_chart(ch, use_container_width=True)
+    st.altair_chart(_chart("line", y_columns, title).properties(
+        data=chart_data(df, [("line", y_columns, title)])), use_container_width=True)
 
 # ----------------------- Chat (liste de messages) ---------------------------
 